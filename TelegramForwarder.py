@@ -1,304 +1,800 @@
 import time
+STARTED = time.perf_counter()  # Startup phases are timed from here
+import os
+import argparse
 import datetime
+import re
 import asyncio
-from telethon.sync import TelegramClient
-from telethon import errors
-#import keep_alive
+import logging
+from telethon import TelegramClient, errors, events
+from checkpoints import CheckpointStore
+from dedup_store import CooldownStore, SQLiteBackend
+from dispatcher import PRIORITY_SLOS, Forward, SendDispatcher
+from logs import setup_logging
+from keep_alive import Metrics, start_keep_alive
+from matcher import MatcherEngine
+from near_duplicates import NearDuplicateIndex
+from pool import ClientPool
+from resolver import ChatResolver, export_dialogs
+from routing import MESSAGE_TYPES, load_routing_file
+from validation import AddressValidator
+from watchers import WatcherRegistry
+IMPORTED = time.perf_counter()
 
-# Start the keep_alive server
-#keep_alive.start_keep_alive()
+POLL_INTERVAL = 5  # Seconds between get_messages calls when polling
+BACKFILL_BATCH = 100  # Messages fetched per request when catching up on a chat
+MAX_BACKFILL_MESSAGES = 5000  # Messages replayed per chat on startup before skipping to the latest
+MAX_CONCURRENT_WATCHERS = 10  # Watchers allowed to call Telegram at the same time
+MAX_COOLDOWN_ENTRIES = 100_000  # Forward timers kept in memory before the ones closest to expiring are evicted
+RELOAD_INTERVAL = 2  # Seconds between checks of the routing file for changes
+ROUTES_JOB = "routes"  # Job name of the watchers started from a routing file
+DESTINATION_SEND_RATE = 1.0  # Messages per second sent to one destination on average
+DESTINATION_SEND_BURST = 5  # Messages sent to one destination back to back before rate limiting
+FORWARD_BATCH_WINDOW = 1.0  # Seconds matches are collected before they are forwarded together
+MAX_FORWARD_IDS = 100  # Message IDs Telegram accepts in one forward request
+ALBUM_SIZE = 10  # Most messages one album can have
+LOG_FILE = "forwarder.log"  # JSON lines log, rotated at 10 MB
+# Timer units in seconds; a number without a unit is seconds, and a month is approximated as 30 days
+TIMER_UNITS = {
+    **dict.fromkeys(("s", "sec", "secs", "second", "seconds"), 1),
+    **dict.fromkeys(("m", "min", "mins", "minute", "minutes"), 60),
+    **dict.fromkeys(("h", "hr", "hrs", "hour", "hours"), 3600),
+    **dict.fromkeys(("d", "day", "days"), 86400),
+    **dict.fromkeys(("w", "wk", "wks", "week", "weeks"), 7 * 86400),
+    **dict.fromkeys(("mo", "month", "months"), 30 * 86400),
+}
+TIMER_PART = re.compile(r"(\d+(?:\.\d+)?)\s*([a-z]*)[\s,]*(?:and\s+)?")  # "1h", "30 minutes, ", "2 days and "
+# Send priority class of each rule type (see dispatcher.PRIORITY_SLOS); contracts are only worth anything in the first seconds
+RULE_PRIORITIES = {
+    "solana": "contract",
+    "ethereum": "contract",
+    "cashtags": "cashtag",
+    "keywords": "bulk",
+}
+
+log = logging.getLogger("forwarder")
 
 class TelegramForwarder:
-    def __init__(self, api_id, api_hash, phone_number):
+    def __init__(self, api_id, api_hash, phone_number, extra_accounts=(), client_factory=TelegramClient):
         self.api_id = api_id
         self.api_hash = api_hash
         self.phone_number = phone_number
-        self.client = TelegramClient('session_' + phone_number, api_id, api_hash)
-        self.active_tasks = []  # List to track active forwarding tasks
-        self.last_forwarded_keywords = {}
-        self.last_forwarded_solana = {}
-        self.last_forwarded_ethereum = {}
-        self.last_forwarded_cashtags = {}
-
-    def _can_forward(self, message, message_type, timer):
+        # Every account as (api_id, api_hash, phone_number); the first one is used for lookups and files
+        self.pool = ClientPool([(api_id, api_hash, phone_number), *extra_accounts], client_factory)
+        self.client = self.pool.primary
+        self.watchers = WatcherRegistry(max_concurrency=MAX_CONCURRENT_WATCHERS)
+        self.job_count = 0
+        self.routing_rules = {}  # rule name -> Rule from the routing file
+        self.cooldown_scopes = {}  # rule name -> namespace of its cooldowns, stable across restarts
+        self.matcher = MatcherEngine()
+        self.routes = {}  # chat ID -> {watcher name: message handler} for event ingestion
+        self.last_message_ids = {}  # watcher name -> last handled message ID
+        self.chat_watchers = {}  # chat ID -> names of the watchers reading it
+        self.checkpoints = CheckpointStore(f"checkpoints_{phone_number}.json")
+        self._event_handler_added = False
+        self._reconnect_lock = asyncio.Lock()
+        self.resolver = ChatResolver(self.client, f"chats_of_{phone_number}.jsonl")
+        # Outgoing messages are queued per destination and sent concurrently
+        self.dispatcher = SendDispatcher(self._send_message, rate=DESTINATION_SEND_RATE, burst=DESTINATION_SEND_BURST,
+                                         on_sent=self._on_sent, forward=self._forward_messages,
+                                         batch_window=FORWARD_BATCH_WINDOW, on_done=self._on_done)
+        # source chat ID -> {message ID -> [sends still queued, cooldown (namespace, key)s to persist once they're done]}
+        self.in_flight = {}
+        self.protected_chats = set()  # Source chats that don't allow forwarding, copied instead
+        # Cooldowns for keywords, solana, ethereum and cashtags, kept across restarts; opened by the first rule
+        self._cooldowns = None
+        self._authorized = False
+        self.startup = {"imports": round(IMPORTED - STARTED, 3)}  # Startup phase -> seconds since STARTED
+        # Fingerprints of recently forwarded keyword messages, per rule, shared by all its source chats
+        self.near_duplicates = NearDuplicateIndex()
+        # Checks contract addresses in worker processes, so bogus base58 or checksum-failing matches aren't forwarded
+        self.validator = AddressValidator()
+
+        # Metrics served on /metrics by keep_alive
+        self.metrics = Metrics()
+        self.metrics_ingested = self.metrics.counter(
+            "forwarder_messages_ingested_total", "Messages received from each source chat.", ["source"])
+        self.metrics_matches = self.metrics.counter(
+            "forwarder_rule_matches_total", "Rule hits by rule type, before cooldowns.", ["type"])
+        self.metrics_forwards = self.metrics.counter(
+            "forwarder_forwards_total", "Messages sent to each destination.", ["destination"])
+        self.metrics_latency = self.metrics.histogram(
+            "forwarder_forward_latency_seconds", "Time from receiving a message to sending its forward.", ["priority"])
+        self.metrics_slo_missed = self.metrics.counter(
+            "forwarder_send_slo_missed_total", "Messages sent later than the latency SLO of their priority class.",
+            ["priority"])
+        self.metrics.gauge("forwarder_send_queue_depth", "Messages waiting to be sent.",
+                           self.dispatcher.queue_depth)
+        self.metrics.gauge("forwarder_send_dropped_total", "Messages dropped because a send queue was full.",
+                           lambda: self.dispatcher.dropped, kind="counter")
+        self.metrics.gauge("forwarder_send_retries_total", "Sends retried after FloodWait.",
+                           lambda: self.dispatcher.retried, kind="counter")
+        self.metrics.gauge("forwarder_send_failures_total", "Messages that could not be sent.",
+                           lambda: self.dispatcher.failed, kind="counter")
+        self.metrics.gauge("forwarder_flood_wait_seconds_total", "Seconds of FloodWait requested by Telegram.",
+                           lambda: self.dispatcher.flood_wait_seconds, kind="counter")
+        self.metrics.gauge("forwarder_cooldown_entries", "Entries in the cooldown store.",
+                           lambda: len(self._cooldowns or ()))
+        self.metrics.gauge("forwarder_near_duplicates_suppressed_total", "Keyword matches dropped as near copies of a recent forward.",
+                           lambda: self.near_duplicates.suppressed, kind="counter")
+        self.metrics.gauge("forwarder_addresses_rejected_total", "Distinct contract addresses that failed validation.",
+                           lambda: self.validator.rejected, kind="counter")
+        self.metrics.gauge("forwarder_watchers", "Running source chat watchers.",
+                           lambda: len(self.watchers.tasks))
+        self.metrics.gauge("forwarder_watcher_restarts_total", "Restarts of the running watchers.",
+                           lambda: sum(self.watchers.restarts.values()), kind="counter")
+        self.metrics.gauge("forwarder_clients_connected", "Telegram accounts currently connected.",
+                           lambda: sum(bool(client.is_connected()) for client in self.pool.clients.values()))
+
+    @property
+    def cooldowns(self):
+        if self._cooldowns is None:
+            self._cooldowns = CooldownStore(SQLiteBackend(f"cooldowns_{self.phone_number}.db"),
+                                            max_entries=MAX_COOLDOWN_ENTRIES)
+        return self._cooldowns
+
+    def _startup_phase(self, phase):
+        """Records when a startup phase was first reached, and logs all of them at the first forward."""
+        if phase in self.startup:
+            return
+        self.startup[phase] = round(time.perf_counter() - STARTED, 3)
+        log.info("Startup phase %s reached after %.3f seconds", phase, self.startup[phase],
+                 extra={"event": "startup_phase", "phase": phase, "seconds": self.startup[phase]})
+        if phase == "first_forward":
+            log.info("Startup timings: %s", ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.startup.items()),
+                     extra={"event": "startup", **{f"{name}_seconds": seconds for name, seconds in self.startup.items()}})
+
+    def _on_sent(self, destination, received_at, priority):
+        self._startup_phase("first_forward")
+        self.metrics_forwards.inc(destination)
+        latency = asyncio.get_running_loop().time() - received_at
+        self.metrics_latency.observe(latency, priority)
+        if latency > PRIORITY_SLOS[priority]:
+            self.metrics_slo_missed.inc(priority)
+
+    def health(self):
+        """Returns (healthy, details): unhealthy while an account is disconnected or a watcher is down."""
+        connected = self.pool.all_connected()
+        down = sorted(self.watchers.failing | self.watchers.dead)
+        details = {
+            "connected": connected,
+            "watchers": len(self.watchers.tasks),
+            "watchers_down": down,
+            "send_queue_depth": self.dispatcher.queue_depth(),
+            "startup": self.startup,
+        }
+        return connected and not down, details
+
+    def _can_forward(self, rule, message, message_type, timer):
         """
-        Determines if the message can be forwarded based on the timer.
+        Determines if the message can be forwarded based on the timer. Every rule
+        has its own cooldowns, so rules of the same type don't hold each other back.
         """
-        now = datetime.datetime.now()
-
-        # Select the appropriate dictionary based on message type
-        if message_type == "keywords":
-            last_forwarded = self.last_forwarded_keywords.get(message)
-        elif message_type == "solana":
-            last_forwarded = self.last_forwarded_solana.get(message)
-        elif message_type == "ethereum":
-            last_forwarded = self.last_forwarded_ethereum.get(message)
-        elif message_type == "cashtags":
-            last_forwarded = self.last_forwarded_cashtags.get(message)
-        else:
+        if message_type not in MESSAGE_TYPES:
             return True
+        return self.cooldowns.can_forward(f"{self.cooldown_scopes.get(rule, rule)}:{message_type}", message,
+                                          timer.total_seconds())
 
-        # If this message has never been forwarded, allow it
-        if not last_forwarded:
-            return True
+    def _update_forward_time(self, rule, message, message_type, timer, source=None):
+        """
+        Updates the last forwarded time for the given message, remembering it for as long as the timer lasts.
+        While sends of the source message are queued, the cooldown is only kept in memory; it is saved once
+        they are done, so a crash in between doesn't block the forwards that backfill replays.
+        """
+        if message_type in MESSAGE_TYPES:
+            namespace = f"{self.cooldown_scopes.get(rule, rule)}:{message_type}"
+            sends = self.in_flight.get(source.chat_id, {}).get(source.id) if source is not None else None
+            self.cooldowns.mark(namespace, message, timer.total_seconds(), persist=sends is None)
+            if sends is not None:
+                sends[1].append((namespace, message))
+
+    def _submit(self, source, destination, item, received_at, context):
+        """Queues a text or Forward, keeping the source message in flight until the dispatcher is done with it."""
+        if self.dispatcher.submit(destination, item, received_at, context, RULE_PRIORITIES[context["type"]]):
+            self._hold(source)
+
+    def _on_done(self, destination, context):
+        """Called by the dispatcher once a send was made or given up on."""
+        self._release(context["source"], context["message_id"])
 
-        # Calculate the time difference
-        time_diff = now - last_forwarded
-        return time_diff >= timer
+    def _hold(self, message):
+        """Keeps the checkpoint of the message's chat before it until _release is called as often."""
+        sends = self.in_flight.setdefault(message.chat_id, {}).setdefault(message.id, [0, []])
+        sends[0] += 1
 
-    def _update_forward_time(self, message, message_type):
+    def _release(self, chat_id, message_id):
+        """Once nothing holds a message anymore, saves its cooldowns and lets the checkpoint move past it."""
+        messages = self.in_flight[chat_id]
+        sends = messages[message_id]
+        sends[0] -= 1
+        if sends[0]:
+            return
+        del messages[message_id]
+        if not messages:
+            del self.in_flight[chat_id]
+        for namespace, key in sends[1]:
+            self.cooldowns.persist(namespace, key)
+        self._save_checkpoint(chat_id)
+
+    def _is_near_duplicate(self, rule, text, timer):
         """
-        Updates the last forwarded time for the given message.
+        True if a rule recently forwarded nearly the same text (from any source chat).
+        Otherwise the text is remembered for as long as the rule's timer, the same window as its cooldown.
+        A rule without a timer forwards every match, so it is never suppressed.
         """
-        now = datetime.datetime.now()
-
-        if message_type == "keywords":
-            self.last_forwarded_keywords[message] = now
-        elif message_type == "solana":
-            self.last_forwarded_solana[message] = now
-        elif message_type == "ethereum":
-            self.last_forwarded_ethereum[message] = now
-        elif message_type == "cashtags":
-            self.last_forwarded_cashtags[message] = now
-
-    async def list_chats(self):
-        await self.client.connect()
-
-        # Ensure you're authorized
-        if not await self.client.is_user_authorized():
-            await self.client.send_code_request(self.phone_number)
-            await self.client.sign_in(self.phone_number, input('Enter the code: '))
-
-        # Get a list of all the dialogs (chats)
-        dialogs = await self.client.get_dialogs()
-        chats_file = open(f"chats_of_{self.phone_number}.txt", "w", encoding='utf-8')
-        # Print information about each chat
-        for dialog in dialogs:
-            username = getattr(dialog.entity, 'username', 'N/A') # Safely check for username attribute
-            print(f"Chat ID: {dialog.id}, Title: {dialog.title}, Username: {username}")
-            chats_file.write(f"Chat ID: {dialog.id}, Title: {dialog.title}, Username: {username} \n")
-
-        chats_file.close()
-        print("List of groups printed successfully!")
+        if not timer:
+            return False
+        return self.near_duplicates.check(rule, text, timer.total_seconds())
+
+    async def list_chats(self, export_format="jsonl", echo=True):
+        """Lists every chat of the account and saves them as JSON lines or CSV (export_format "jsonl" or "csv")."""
+        await self._ensure_authorized()
+
+        # Stream the dialogs (chats) to chats_of_<phone>.jsonl (the resolver's cache) or .csv, a page at a time
+        path = f"chats_of_{self.phone_number}.{export_format}"
+
+        def print_page(rows):
+            print("\n".join(f"Chat ID: {row['id']}, Title: {row['title']}, Username: {row['username'] or 'N/A'}, "
+                            f"Type: {row['type']}, Members: {row['members'] or 'N/A'}" for row in rows))
+
+        count = await export_dialogs(self.client, path, on_page=print_page if echo else None)
+        if path == self.resolver.cache_path:
+            # The export is a fresh copy of the index: load it from there the next time it's needed
+            self.resolver.loaded = False
+            self.resolver.refreshed = True
+        print(f"List of {count} chats saved to {path}")
+
+    def load_chats_file(self, path):
+        """Looks titles and usernames up in a chat export (JSON lines or CSV, e.g. from --export-chats) too."""
+        try:
+            count = self.resolver.load_export(path)
+        except (OSError, ValueError, KeyError) as e:
+            raise SystemExit(f"Could not read the chat list {path}: {e!r}") from None
+        log.info("Loaded %s, %d chats are known.", path, count, extra={"event": "chats_file_loaded", "chats": count})
 
     async def _get_chat_id_from_title(self, title):
-        """Helper method to get chat ID from title."""
-        dialogs = await self.client.get_dialogs()
-        for dialog in dialogs:
-            if dialog.title.lower() == title.lower():
-                return dialog.id
-        raise ValueError(f"Chat with title '{title}' not found.")
-
-    async def forward_messages_to_channel(self, source_chats, destinations, keywords, 
-                                          solana_enabled=False, solana_source_chats=None, solana_destinations=None, solana_timer=None,
-                                          eth_enabled=False, eth_source_chats=None, eth_destinations=None, eth_timer=None,
-                                          cashtag_enabled=False, cashtag_source_chats=None, cashtag_destinations=None, cashtag_timer=None,
-                                          keyword_timer=None):
-        task = asyncio.current_task()  # Get the current task to track it
-        self.active_tasks.append(task)  # Add the task to the active tasks list
-
-        await self.client.connect()
-
-        # Ensure you're authorized
-        if not await self.client.is_user_authorized():
-            await self.client.send_code_request(self.phone_number)
-            await self.client.sign_in(self.phone_number, input('Enter the code: '))
-
-        # Helper function to parse timers
-        def parse_timer(timer_str):
-            if "month" in timer_str:
-                months = int(timer_str.split(" ")[0])
-                return datetime.timedelta(days=months * 30)  # Approximate month as 30 days
-            elif "day" in timer_str:
-                days = int(timer_str.split(" ")[0])
-                return datetime.timedelta(days=days)
-            elif "minute" in timer_str:
-                minutes = int(timer_str.split(" ")[0])
-                return datetime.timedelta(minutes=minutes)
-            elif "hour" in timer_str:
-                hours = int(timer_str.split(" ")[0])
-                return datetime.timedelta(hours=hours)
-            return datetime.timedelta()  # Default to 0 if no valid time
+        """Helper method to get chat ID from title (or username) through the resolver's index."""
+        return await self.resolver.resolve(title)
 
-        keyword_timer_delta = parse_timer(keyword_timer) if keyword_timer else datetime.timedelta()
-        solana_timer_delta = parse_timer(solana_timer) if solana_timer else datetime.timedelta()
-        eth_timer_delta = parse_timer(eth_timer) if eth_timer else datetime.timedelta()
-        cashtag_timer_delta = parse_timer(cashtag_timer) if cashtag_timer else datetime.timedelta()
-
-        # Forward keyword-based messages
-        for source_chat in source_chats:
-            if isinstance(source_chat, str) and source_chat.lstrip('-').isdigit():
-                source_chat_id = int(source_chat)  # Convert it to an integer (chat ID)
-            elif isinstance(source_chat, str):
-                # It's a title, try to resolve it
-                print(f"Finding chat by title: {source_chat}")
-                try:
-                    source_chat_id = await self._get_chat_id_from_title(source_chat)
-                    print(f"Found chat ID for '{source_chat}': {source_chat_id}")
-                except ValueError as e:
-                    print(e)
-                    continue  # Skip to the next source chat if this one fails
+    async def _resolve_chat(self, chat):
+        """Resolves a chat ID or title into a chat ID, returns None if it can't be found."""
+        if isinstance(chat, str) and not chat.strip():
+            return None  # Empty entry, e.g. from a trailing comma
+        if isinstance(chat, str) and chat.strip().lstrip('-').isdigit():
+            return int(chat)  # Convert it to an integer (chat ID)
+        elif isinstance(chat, str):
+            # It's a title, try to resolve it
+            try:
+                chat_id = await self._get_chat_id_from_title(chat.strip())
+                log.debug("Found chat ID for '%s': %s", chat.strip(), chat_id,
+                          extra={"event": "chat_resolved", "title": chat.strip(), "chat_id": chat_id})
+                return chat_id
+            except ValueError as e:
+                log.warning("%s", e, extra={"event": "chat_not_found", "title": chat.strip()})
+                return None
+        return chat  # Use the provided chat ID (if it's already a number)
+
+    async def _resolve_chats(self, chats):
+        """Resolves a list of chat IDs or titles, skipping the chats that can't be found."""
+        chat_ids = []
+        for chat in chats or ():
+            chat_id = await self._resolve_chat(chat)
+            if chat_id is not None and chat_id not in chat_ids:
+                chat_ids.append(chat_id)
+        return chat_ids
+
+    async def _poll_chat_once(self, chat_id, last_message_id, handler):
+        """Runs one get_messages pass over a chat and returns the new last message ID."""
+        client = self.pool.client_for_chat(chat_id)
+        messages = await client.get_messages(chat_id, min_id=last_message_id, limit=None)
+        for message in reversed(messages):
+            self.metrics_ingested.inc(chat_id)
+            await handler(message, self.matcher.scan(message.text), asyncio.get_running_loop().time())
+            last_message_id = max(last_message_id, message.id)
+        return last_message_id
+
+    async def _reconnect(self, client):
+        """Reconnects a client once, however many watchers noticed the disconnection."""
+        async with self._reconnect_lock:
+            if not client.is_connected():
+                log.warning("Connection lost, reconnecting...",
+                            extra={"event": "reconnecting", "account": self.pool.phone_of(client)})
+                self.pool.rebalance()  # Its chats move to other accounts while it's down
+                await client.connect()
+                self.pool.rebalance()
+
+    async def _on_new_message(self, event):
+        """Single NewMessage handler that dispatches to the watchers of the chat."""
+        watchers = self.routes.get(event.chat_id)
+        if not watchers:
+            return
+        if len(self.pool) > 1 and self.pool.client_for_chat(event.chat_id) is not event.client:
+            return  # Another account reads this chat
+        received_at = asyncio.get_running_loop().time()
+        self.metrics_ingested.inc(event.chat_id)
+        matches = self.matcher.scan(event.message.text)  # Scanned once for every rule of the chat
+        async with self.watchers.limit:
+            for on_message in list(watchers.values()):
+                await on_message(event.message, matches, received_at)
+
+    async def _latest_message_id(self, chat_id):
+        messages = await self.pool.client_for_chat(chat_id).get_messages(chat_id, limit=1)
+        return messages[0].id if messages else 0  # An empty chat starts from 0
+
+    async def _backfill(self, chat_id, handler, min_id, limit=None):
+        """
+        Replays the messages posted after min_id, oldest first, through handler.
+        They are fetched with iter_messages in batches of BACKFILL_BATCH, holding
+        the watcher semaphore for one batch at a time. Returns the number of
+        messages replayed, stopping after `limit` of them.
+        """
+        replayed = 0
+        while limit is None or replayed < limit:
+            async with self.watchers.limit:
+                batch = [message async for message in self.pool.client_for_chat(chat_id).iter_messages(
+                    chat_id, min_id=min_id, reverse=True, limit=BACKFILL_BATCH)]
+            for message in batch:
+                self.metrics_ingested.inc(chat_id)
+                await handler(message, self.matcher.scan(message.text), asyncio.get_running_loop().time())
+                min_id = max(min_id, message.id)
+            replayed += len(batch)
+            if len(batch) < BACKFILL_BATCH:
+                break
+        return replayed
+
+    def _save_checkpoint(self, chat_id):
+        """
+        Checkpoints a chat at the oldest position of its watchers, so no rule skips a message,
+        and before the oldest message with sends still queued, so a restart replays those.
+        """
+        positions = [self.last_message_ids[name] for name in self.chat_watchers.get(chat_id, ())
+                     if name in self.last_message_ids]
+        if positions:
+            in_flight = self.in_flight.get(chat_id)
+            if in_flight:
+                positions.append(min(in_flight) - 1)  # Not past a message whose forwards are still queued
+            self.checkpoints.update(chat_id, min(positions))
+
+    async def _watch_chat(self, name, chat_id, handler, ingestion_mode):
+        """
+        Watches one source chat for one rule. It starts by backfilling whatever
+        was posted since the chat's checkpoint (or since this watcher failed).
+        In "events" mode new messages are then pushed through _on_new_message
+        and the chat is only read again to catch up after a reconnect; in
+        "polling" mode it is checked every POLL_INTERVAL seconds.
+
+        In "events" mode the watcher is routed before it backfills, so nothing
+        posted in between is missed. Live messages that come in during a
+        catch-up are held back and handled after it, in ID order, so they
+        can't move the position past messages the catch-up hasn't read yet.
+        """
+        held = None  # Live messages that came in during a catch-up, None when there is none
+
+        async def on_message(message, matches, received_at):
+            if message.id <= self.last_message_ids[name]:
+                return  # Already handled during a catch-up
+            self.last_message_ids[name] = message.id
+            self._hold(message)  # The checkpoint stays before it until its forwards are sent
+            try:
+                await handler(message, matches, received_at)
+            finally:
+                self._release(message.chat_id, message.id)
+
+        async def on_live_message(message, matches, received_at):
+            if held is not None:
+                held.append((message, matches, received_at))
             else:
-                source_chat_id = source_chat  # Use the provided chat ID (if it's already a number)
+                await on_message(message, matches, received_at)
 
-            last_message_id = (await self.client.get_messages(source_chat_id, limit=1))[0].id
-            while True:
-                # Check if this task is canceled
-                if task.cancelled():
-                    print("Forwarding job has been stopped.")
-                    break
-
-                messages = await self.client.get_messages(source_chat_id, min_id=last_message_id, limit=None)
-                for message in reversed(messages):
-                    if keywords and message.text and any(keyword in message.text.lower() for keyword in keywords):
-                        if self._can_forward(message.text, "keywords", keyword_timer_delta):
-                            for destination in destinations:
-                                await self._send_message(destination, message.text, False)
-                            self._update_forward_time(message.text, "keywords")
-                    last_message_id = max(last_message_id, message.id)
-                await asyncio.sleep(5)
-
-        # Forward Solana contract messages
-        if solana_enabled:
-            for solana_source_chat in solana_source_chats:
-                if isinstance(solana_source_chat, str) and solana_source_chat.lstrip('-').isdigit():
-                    solana_source_chat_id = int(solana_source_chat)  # Convert it to an integer (chat ID)
-                elif isinstance(solana_source_chat, str):
-                    print(f"Finding chat by title: {solana_source_chat}")
-                    try:
-                        solana_source_chat_id = await self._get_chat_id_from_title(solana_source_chat)
-                        print(f"Found chat ID for '{solana_source_chat}': {solana_source_chat_id}")
-                    except ValueError as e:
-                        print(e)
-                        continue  # Skip to the next source chat if this one fails
+        async def caught_up():
+            """Handles the live messages held back during a catch-up, including any that come in meanwhile."""
+            nonlocal held
+            while held:
+                batch = sorted(held, key=lambda entry: entry[0].id)
+                held.clear()
+                for entry in batch:
+                    await on_message(*entry)
+            held = None
+
+        self.chat_watchers.setdefault(chat_id, set()).add(name)
+        routed = False
+        try:
+            if ingestion_mode != "polling":
+                held = []
+                self._ensure_event_handler()
+                self.routes.setdefault(chat_id, {})[name] = on_live_message
+                routed = True
+
+            catch_up = True
+            if name not in self.last_message_ids:
+                checkpoint = self.checkpoints.get(chat_id)
+                if checkpoint is None:
+                    # Never watched before: start from the latest message
+                    async with self.watchers.limit:
+                        self.last_message_ids[name] = await self._latest_message_id(chat_id)
+                    catch_up = False
                 else:
-                    solana_source_chat_id = solana_source_chat  # Use the provided chat ID (if it's already a number)
+                    self.last_message_ids[name] = checkpoint
+
+            if catch_up:
+                replayed = await self._backfill(chat_id, on_message, self.last_message_ids[name], MAX_BACKFILL_MESSAGES)
+                if replayed:
+                    log.info("Backfilled %d message(s) for %s.", replayed, name,
+                             extra={"event": "backfilled", "watcher": name, "source": chat_id, "count": replayed})
+                if replayed >= MAX_BACKFILL_MESSAGES:
+                    log.warning("Backfill of %s stopped after %d messages, skipping to the latest message.", name, replayed,
+                                extra={"event": "backfill_truncated", "watcher": name, "source": chat_id})
+                    async with self.watchers.limit:
+                        self.last_message_ids[name] = await self._latest_message_id(chat_id)
+            self._save_checkpoint(chat_id)
+            self._startup_phase("watching")
 
-                last_message_id = (await self.client.get_messages(solana_source_chat_id, limit=1))[0].id
+            if ingestion_mode == "polling":
                 while True:
-                    if task.cancelled():
-                        print("Solana forwarding job has been stopped.")
-                        break
-
-                    messages = await self.client.get_messages(solana_source_chat_id, min_id=last_message_id, limit=None)
-                    for message in reversed(messages):
-                        solana_contract = self._find_solana_contract(message.text)
-                        if solana_contract and self._can_forward(solana_contract, "solana", solana_timer_delta):
-                            for solana_destination in solana_destinations:
-                                await self._send_message(solana_destination, solana_contract, False)
-                            self._update_forward_time(solana_contract, "solana")
-                    last_message_id = max(last_message_id, message.id)
-                await asyncio.sleep(5)
-
-        # Forward Ethereum contract messages
-        if eth_enabled:
-            for eth_source_chat in eth_source_chats:
-                if isinstance(eth_source_chat, str) and eth_source_chat.lstrip('-').isdigit():
-                    eth_source_chat_id = int(eth_source_chat)  # Convert it to an integer (chat ID)
-                elif isinstance(eth_source_chat, str):
-                    print(f"Finding chat by title: {eth_source_chat}")
+                    async with self.watchers.limit:
+                        await self._poll_chat_once(chat_id, self.last_message_ids[name], on_message)
+                    await asyncio.sleep(POLL_INTERVAL)
+
+            await caught_up()
+            while True:
+                # Sleeps without any API calls until the connection drops or the accounts are rebalanced
+                client = self.pool.client_for_chat(chat_id)
+                if await self.pool.wait_for_change(client):
+                    held = []
                     try:
-                        eth_source_chat_id = await self._get_chat_id_from_title(eth_source_chat)
-                        print(f"Found chat ID for '{eth_source_chat}': {eth_source_chat_id}")
-                    except ValueError as e:
-                        print(e)
-                        continue  # Skip to the next source chat if this one fails
-                else:
-                    eth_source_chat_id = eth_source_chat  # Use the provided chat ID (if it's already a number)
+                        await self._reconnect(client)
+                    finally:
+                        # Read what was missed, with whichever account now owns the chat
+                        await self._backfill(chat_id, on_message, self.last_message_ids[name])
+                    await caught_up()
+        finally:
+            self.chat_watchers[chat_id].discard(name)
+            if not self.chat_watchers[chat_id]:
+                del self.chat_watchers[chat_id]
+            if routed:
+                del self.routes[chat_id][name]
+                if not self.routes[chat_id]:
+                    del self.routes[chat_id]
 
-                last_message_id = (await self.client.get_messages(eth_source_chat_id, limit=1))[0].id
-                while True:
-                    if task.cancelled():
-                        print("Ethereum forwarding job has been stopped.")
-                        break
-
-                    messages = await self.client.get_messages(eth_source_chat_id, min_id=last_message_id, limit=None)
-                    for message in reversed(messages):
-                        eth_contract = self._find_ethereum_contract(message.text)
-                        if eth_contract and self._can_forward(eth_contract, "ethereum", eth_timer_delta):
-                            for eth_destination in eth_destinations:
-                                await self._send_message(eth_destination, eth_contract, False)
-                            self._update_forward_time(eth_contract, "ethereum")
-                    last_message_id = max(last_message_id, message.id)
-                await asyncio.sleep(5)
-
-        # Forward Cashtag messages
+    def _ensure_event_handler(self):
+        if not self._event_handler_added:
+            for client in self.pool.clients.values():
+                client.add_event_handler(self._on_new_message, events.NewMessage())
+            self._event_handler_added = True
+
+    async def _process_keywords(self, message, matches, rule, destinations, timer, received_at):
+        if rule in matches.rules and message.text:  # Media without a caption has nothing to copy
+            self.metrics_matches.inc("keywords")
+            if self._can_forward(rule, message.text, "keywords", timer) and not self._is_near_duplicate(rule, message.text, timer):
+                context = {"rule": rule, "source": message.chat_id, "message_id": message.id, "type": "keywords"}
+                for destination in destinations:
+                    self._submit(message, destination, message.text, received_at, context)
+                self._update_forward_time(rule, message.text, "keywords", timer, message)
+
+    async def _process_keyword_forwards(self, message, matches, rule, destinations, timer, received_at):
+        """Like _process_keywords, but forwards the original message (media, formatting and albums)."""
+        if rule in matches.rules:
+            self.metrics_matches.inc("keywords")
+            # Media without a caption can't be told apart by its text, so each one has its own cooldown
+            key = message.text or f"{message.chat_id}/{message.id}"
+            if self._can_forward(rule, key, "keywords", timer) and not self._is_near_duplicate(rule, message.text, timer):
+                context = {"rule": rule, "source": message.chat_id, "message_id": message.id, "type": "keywords"}
+                for destination in destinations:
+                    self._submit(message, destination, Forward(message.chat_id, message), received_at, context)
+                self._update_forward_time(rule, key, "keywords", timer, message)
+
+    async def _process_solana(self, message, matches, rule, destinations, timer, received_at):
+        for solana_contract in matches.solana:
+            if not await self.validator.validate("solana", solana_contract):
+                continue
+            self.metrics_matches.inc("solana")
+            if self._can_forward(rule, solana_contract, "solana", timer):
+                context = {"rule": rule, "source": message.chat_id, "message_id": message.id, "type": "solana"}
+                for solana_destination in destinations:
+                    self._submit(message, solana_destination, solana_contract, received_at, context)
+                self._update_forward_time(rule, solana_contract, "solana", timer, message)
+
+    async def _process_ethereum(self, message, matches, rule, destinations, timer, received_at):
+        for eth_contract in matches.ethereum:
+            if not await self.validator.validate("ethereum", eth_contract):
+                continue
+            self.metrics_matches.inc("ethereum")
+            if self._can_forward(rule, eth_contract, "ethereum", timer):
+                context = {"rule": rule, "source": message.chat_id, "message_id": message.id, "type": "ethereum"}
+                for eth_destination in destinations:
+                    self._submit(message, eth_destination, eth_contract, received_at, context)
+                self._update_forward_time(rule, eth_contract, "ethereum", timer, message)
+
+    async def _process_cashtags(self, message, matches, rule, destinations, timer, received_at):
+        for cashtag in matches.cashtags:
+            self.metrics_matches.inc("cashtags")
+            if self._can_forward(rule, cashtag, "cashtags", timer):
+                context = {"rule": rule, "source": message.chat_id, "message_id": message.id, "type": "cashtags"}
+                for cashtag_destination in destinations:
+                    self._submit(message, cashtag_destination, cashtag, received_at, context)
+                self._update_forward_time(rule, cashtag, "cashtags", timer, message)
+
+    async def forward_messages_to_channel(self, source_chats=None, destinations=None, keywords=None,
+                                          solana_enabled=False, solana_source_chats=None, solana_destinations=None, solana_timer=None,
+                                          eth_enabled=False, eth_source_chats=None, eth_destinations=None, eth_timer=None,
+                                          cashtag_enabled=False, cashtag_source_chats=None, cashtag_destinations=None, cashtag_timer=None,
+                                          keyword_timer=None, ingestion_mode="events", keyword_forward=False):
+        """
+        Starts a forwarding job: one supervised watcher per (source chat, rule).
+
+        ingestion_mode is "events" (default) to react to Telegram updates as they
+        arrive, or "polling" to check each chat with get_messages every few seconds.
+        With keyword_forward, keyword matches are forwarded as the original messages
+        instead of copies of their text.
+        Returns the job name, which can be passed to stop_forwarding_job.
+        """
+        await self._ensure_authorized()
+
+        self.job_count += 1
+        job_name = f"job{self.job_count}"
+
+        if source_chats:
+            await self._start_rule(f"{job_name}/Keyword", "keywords", source_chats, destinations,
+                                   keywords, keyword_timer, ingestion_mode, keyword_forward)
+        if solana_enabled:
+            await self._start_rule(f"{job_name}/Solana", "solana", solana_source_chats, solana_destinations,
+                                   None, solana_timer, ingestion_mode)
+        if eth_enabled:
+            await self._start_rule(f"{job_name}/Ethereum", "ethereum", eth_source_chats, eth_destinations,
+                                   None, eth_timer, ingestion_mode)
         if cashtag_enabled:
-            for cashtag_source_chat in cashtag_source_chats:
-                if isinstance(cashtag_source_chat, str) and cashtag_source_chat.lstrip('-').isdigit():
-                    cashtag_source_chat_id = int(cashtag_source_chat)  # Convert it to an integer (chat ID)
-                elif isinstance(cashtag_source_chat, str):
-                    print(f"Finding chat by title: {cashtag_source_chat}")
-                    try:
-                        cashtag_source_chat_id = await self._get_chat_id_from_title(cashtag_source_chat)
-                        print(f"Found chat ID for '{cashtag_source_chat}': {cashtag_source_chat_id}")
-                    except ValueError as e:
-                        print(e)
-                        continue  # Skip to the next source chat if this one fails
+            await self._start_rule(f"{job_name}/Cashtag", "cashtags", cashtag_source_chats, cashtag_destinations,
+                                   None, cashtag_timer, ingestion_mode)
+
+        log.info("Forwarding job %s started with %d watcher(s).", job_name, len(self.watchers.names(job_name)),
+                 extra={"event": "job_started", "job": job_name})
+        return job_name
+
+    async def _ensure_authorized(self, interactive=True):
+        """
+        Connects and signs in every account, once per run; every job and list_chats
+        share those sessions. Dropped connections are restored by the watchers.
+        """
+        if self._authorized:
+            return
+        await asyncio.gather(*(client.connect() for client in self.pool.clients.values()))
+        self._startup_phase("connected")
+        for phone_number, client in self.pool.clients.items():
+            # Ensure you're authorized
+            if not await client.is_user_authorized():
+                if not interactive:
+                    raise RuntimeError(f"The session of {phone_number} is not authorized yet. "
+                                       "Run the interactive menu once to sign in.")
+                await client.send_code_request(phone_number)
+                await client.sign_in(phone_number, input(f'Enter the code for {phone_number}: '))
+        self._startup_phase("authorized")
+        await self.pool.load_dialogs()
+        self._authorized = True
+
+    async def _start_rule(self, rule_name, rule_type, source_chats, destinations, keywords=None, timer=None,
+                          ingestion_mode="events", forward=False, cooldown_scope=None):
+        """
+        Adds a rule to the routing table: its keywords go into the shared matcher
+        and a watcher is started for each source chat, named "<rule name>/<chat ID>".
+        forward only applies to keyword rules, the others send the addresses or cashtags they find.
+        Cooldowns are kept under cooldown_scope, or by default under the rule's
+        destinations, since the names of interactive jobs change with every run.
+        """
+        self.resolver.watch()
+        timer_delta = parse_timer(timer) if timer else datetime.timedelta()
+
+        # Destinations are resolved once so titles work and sends don't need lookups
+        destinations = await self._resolve_chats(destinations)
+        self.cooldown_scopes[rule_name] = cooldown_scope or "to " + ",".join(map(str, sorted(destinations)))
+
+        process = {
+            "keywords": self._process_keywords,
+            "solana": self._process_solana,
+            "ethereum": self._process_ethereum,
+            "cashtags": self._process_cashtags,
+        }[rule_type]
+        if rule_type == "keywords" and forward:
+            process = self._process_keyword_forwards
+        if rule_type == "keywords":
+            self.matcher.set_keywords(rule_name, keywords)
+
+        def handler(message, matches, received_at):
+            return process(message, matches, rule_name, destinations, timer_delta, received_at)
+
+        # Resolve titles to chat IDs and start a watcher per chat, skipping the chats that can't be found
+        for chat_id in await self._resolve_chats(source_chats):
+            name = f"{rule_name}/{chat_id}"
+            self.watchers.start(name, lambda name=name, chat_id=chat_id:
+                                self._watch_chat(name, chat_id, handler, ingestion_mode))
+
+    def _forget_idle_keyword_rules(self):
+        """Drops the keywords of rules that have no watchers left."""
+        for rule in list(self.matcher.keyword_rules):
+            if not self.watchers.names(rule):
+                self.matcher.remove_rule(rule)
+                self.near_duplicates.forget(rule)
+
+    def _forget_idle_checkpoints(self):
+        """
+        Drops the checkpoints of chats that have no watchers left, so a job started on them
+        later begins at their latest message instead of backfilling the time they weren't watched.
+        """
+        watched = {int(name.rsplit("/", 1)[1]) for name in self.watchers.names()}
+        for chat_id in list(self.checkpoints.positions):
+            if chat_id not in watched:
+                self.checkpoints.discard(chat_id)
+
+    async def run_routing_file(self, path, reload_interval=RELOAD_INTERVAL):
+        """
+        Headless mode: runs the rules of a routing file until cancelled, and
+        applies the file again whenever it changes.
+        """
+        await self._ensure_authorized(interactive=False)
+        modified = None
+        while True:
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError as e:
+                log.error("Could not read %s: %s", path, e, extra={"event": "routing_unreadable", "rate_key": "routing_unreadable"})
+                current = modified
+            if current != modified:
+                modified = current
+                try:
+                    rules = load_routing_file(path)
+                except Exception as e:
+                    log.error("Could not load %s, keeping the current rules: %s", path, e, extra={"event": "routing_invalid"})
                 else:
-                    cashtag_source_chat_id = cashtag_source_chat  # Use the provided chat ID (if it's already a number)
+                    await self._apply_rules(rules)
+            await asyncio.sleep(reload_interval)
 
-                last_message_id = (await self.client.get_messages(cashtag_source_chat_id, limit=1))[0].id
-                while True:
-                    if task.cancelled():
-                        print("Cashtag forwarding job has been stopped.")
-                        break
-
-                    messages = await self.client.get_messages(cashtag_source_chat_id, min_id=last_message_id, limit=None)
-                    for message in reversed(messages):
-                        cashtags = self._find_cashtag(message.text)
-                        if cashtags:
-                            for cashtag in cashtags:
-                                if self._can_forward(cashtag, "cashtags", cashtag_timer_delta):
-                                    for cashtag_destination in cashtag_destinations:
-                                        await self._send_message(cashtag_destination, cashtag, False)
-                                    self._update_forward_time(cashtag, "cashtags")
-                    last_message_id = max(last_message_id, message.id)
-                await asyncio.sleep(5)
-
-        # Remove this task from active tasks when done
-        self.active_tasks.remove(task)  # Remove the task from the active tasks list
-
-
-    async def _send_message(self, destination, message_text, is_bot):
-        """Helper method to handle sending a message to a bot or a regular destination."""
+    async def _apply_rules(self, rules):
+        """
+        Replaces the routing file rules with `rules`. Only rules that were removed
+        or changed are stopped; a changed rule keeps its watcher names, so its
+        watchers resume from their last message and catch up on the gap.
+        """
+        new_rules = {rule.name: rule for rule in rules}
+        for name, rule in list(self.routing_rules.items()):
+            if new_rules.get(name) != rule:
+                await self.watchers.stop(f"{ROUTES_JOB}/{name}")
+                del self.routing_rules[name]
+        self._forget_idle_keyword_rules()
+
+        for name, rule in new_rules.items():
+            if name not in self.routing_rules:
+                await self._start_rule(f"{ROUTES_JOB}/{name}", rule.type, rule.sources, rule.destinations,
+                                       rule.keywords, rule.cooldown, forward=rule.forward,
+                                       cooldown_scope=f"{ROUTES_JOB}/{name}")
+                self.routing_rules[name] = rule
+        self._forget_idle_checkpoints()  # After the new rules started, so the chats they still watch keep theirs
+        log.info("Routing %d rule(s) with %d watcher(s).", len(new_rules), len(self.watchers.names(ROUTES_JOB)),
+                 extra={"event": "routing_applied"})
+
+    async def close(self):
+        """Gives queued forwards a chance to go out, stops every watcher and saves the cooldowns and checkpoints."""
         try:
-            # Send the message to the bot or regular channel
-            if is_bot:
-                await self.client.send_message(destination, message_text)
-                print(f"Message forwarded to bot {destination}: {message_text}")
-            else:
-                await self.client.send_message(destination, message_text)
-                print(f"Message forwarded to channel/chat ID {destination}: {message_text}")
-        except errors.FloodWaitError as e:
-            print(f"Flood wait: Need to wait for {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
-        except Exception as e:
-            print(f"An error occurred while forwarding the message: {e}")
+            # While the watchers still run, so the checkpoints move past the messages sent meanwhile
+            await self.dispatcher.drain(timeout=10)
+        except asyncio.TimeoutError:
+            log.warning("Exiting with %d unsent message(s).", self.dispatcher.queue_depth())
+        await self.watchers.stop()
+        await self.dispatcher.stop()
+        self.validator.close()
+        if self._cooldowns is not None:
+            self._cooldowns.close()
+        self.checkpoints.close()
+
+    async def _input_entity(self, client, chat_id):
+        if client is self.client:
+            return await self.resolver.input_entity(chat_id)
+        return await self.pool.input_entity(client, chat_id)
+
+    async def _send_message(self, destination, message_text):
+        """
+        Sends a message to a bot or a regular destination. Called by the dispatcher's
+        workers, which handle errors and logging. With several accounts, a flood-limited
+        account is taken out of rotation and the next one is tried straight away.
+        """
+        tried = set()
+        while True:
+            client = self.pool.sender_for(destination, exclude=tried)
+            try:
+                # Send the message to the bot or regular channel
+                await client.send_message(await self._input_entity(client, destination), message_text)
+                break
+            except errors.FloodWaitError as e:
+                self.pool.mark_flood_limited(client, e.seconds)
+                tried.add(self.pool.phone_of(client))
+                if self.pool.sender_for(destination, exclude=tried) is None:
+                    raise  # Every account is limited, let the dispatcher park the destination
 
-    async def stop_forwarding_job(self, job_number):
-        """Stops the specified forwarding job."""
+    async def _forward_messages(self, destination, chat_id, messages):
+        """
+        Forwards messages of one source chat to a destination, called by the
+        dispatcher with every match of its batch window. Whole albums are sent
+        even if only one of their messages matched, and chats that don't allow
+        forwarding are copied instead.
+        """
+        # The account reading the chat is the one that is sure to see its messages
+        client = self.pool.client_for_chat(chat_id)
+        messages = await self._with_albums(client, chat_id, messages)
         try:
-            task = self.active_tasks[job_number]
-            task.cancel()  # Cancel the task
-            print(f"Forwarding job {job_number + 1} has been stopped.")
-        except IndexError:
-            print("Invalid job number. Please try again.")
-
-def _find_solana_contract(self, text):
-    import re
-    solana_pattern = r'[1-9A-HJ-NP-Za-km-z]{32,44}'  # Base58 regex for Solana contract address
-    matches = re.findall(solana_pattern, text)
-    # Add custom validation logic if needed
-    return matches[0] if matches else None
-
-def _find_ethereum_contract(self, text):
-    import re
-    eth_pattern = r'0x[a-fA-F0-9]{40}'  # Regex for Ethereum contract address
-    matches = re.findall(eth_pattern, text)
-    # Add custom validation logic if needed
-    return matches[0] if matches else None
+            if chat_id not in self.protected_chats:
+                try:
+                    for chunk in _chunk_albums(messages, MAX_FORWARD_IDS):
+                        await client.forward_messages(await self._input_entity(client, destination),
+                                                      [message.id for message in chunk],
+                                                      await self._input_entity(client, chat_id))
+                    return
+                except errors.ChatForwardsRestrictedError:
+                    log.warning("Chat %s doesn't allow forwarding, copying its messages instead.", chat_id,
+                                extra={"event": "forwarding_restricted", "source": chat_id})
+                    self.protected_chats.add(chat_id)
+            # Copy mode: one send per message (or album) with its text and formatting; protected media can't be re-sent
+            entity = await self._input_entity(client, destination)
+            for chunk in _chunk_albums(messages, 1):
+                captioned = next((message for message in chunk if message.message), None)
+                if captioned is not None:
+                    await client.send_message(entity, captioned.message, formatting_entities=captioned.entities)
+        except errors.FloodWaitError as e:
+            self.pool.mark_flood_limited(client, e.seconds)
+            raise
 
+    async def _with_albums(self, client, chat_id, messages):
+        """Adds the other messages of any album in messages, in ID order and without duplicates."""
+        by_id = {message.id: message for message in messages}
+        albums = {message.grouped_id for message in messages if message.grouped_id}
+        if albums:
+            # Album messages have consecutive IDs, so the neighbours of each match cover it
+            around = sorted({message_id for message in messages if message.grouped_id
+                             for message_id in range(message.id - ALBUM_SIZE + 1, message.id + ALBUM_SIZE)})
+            for message in await client.get_messages(chat_id, ids=around):
+                if message is not None and message.grouped_id in albums:
+                    by_id[message.id] = message
+        return [by_id[message_id] for message_id in sorted(by_id)]
+
+    async def stop_forwarding_job(self, name):
+        """Stops a forwarding job, or a single watcher, by name."""
+        stopped = await self.watchers.stop(name)
+        self._forget_idle_keyword_rules()
+        self._forget_idle_checkpoints()
+        if stopped:
+            log.info("Stopped %d watcher(s) of %s.", stopped, name, extra={"event": "job_stopped", "job": name})
+        else:
+            print(f"No running job or watcher named '{name}'.")
+        return stopped
+
+
+def _chunk_albums(messages, size):
+    """Packs messages into lists of at most `size` messages without splitting an album across lists."""
+    units = []  # Single messages and whole albums
+    for message in messages:
+        if units and message.grouped_id and units[-1][-1].grouped_id == message.grouped_id:
+            units[-1].append(message)
+        else:
+            units.append([message])
+    chunks = []
+    for unit in units:
+        if chunks and len(chunks[-1]) + len(unit) <= size:
+            chunks[-1].extend(unit)
+        else:
+            chunks.append(unit)
+    return chunks
+
+# Function to parse timers such as "10 minutes", "2 months", "1h30m", "90s" or "1 week, 2 days"
+def parse_timer(timer_str):
+    total = 0
+    position = 0
+    text = timer_str.strip().lower()
+    while position < len(text):
+        match = TIMER_PART.match(text, position)
+        unit = match and TIMER_UNITS.get(match.group(2) or "s")
+        if not unit:
+            log.warning("Invalid timer %r, forwarding without a timer.", timer_str)
+            return datetime.timedelta()  # Default to 0 if no valid time
+        total += float(match.group(1)) * unit
+        position = match.end()
+    return datetime.timedelta(seconds=total)
 
 # Function to read credentials from file
 def read_credentials():
@@ -313,6 +809,16 @@ def read_credentials():
         print("Credentials file not found.")
         return None, None, None
 
+# Function to read the accounts listed after the first one in credentials.txt (pool mode)
+def read_extra_accounts():
+    try:
+        with open("credentials.txt", "r") as file:
+            lines = [line.strip() for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+    # Every further account is another api_id, api_hash, phone_number triple
+    return [tuple(lines[index:index + 3]) for index in range(3, len(lines) - 2, 3)]
+
 # Function to write credentials to file
 def write_credentials(api_id, api_hash, phone_number):
     with open("credentials.txt", "w") as file:
@@ -320,17 +826,27 @@ def write_credentials(api_id, api_hash, phone_number):
         file.write(api_hash + "\n")
         file.write(phone_number + "\n")
 
-async def main():
+async def ainput(prompt=""):
+    """input() that runs in a thread, so the watchers keep running while the menu waits."""
+    return await asyncio.get_running_loop().run_in_executor(None, input, prompt)
+
+async def main(metrics_port=None, chats_file=None):
     # Attempt to read credentials from file
     api_id, api_hash, phone_number = read_credentials()
     
     if api_id is None or api_hash is None or phone_number is None:
-        api_id = input("Enter your API ID: ")
-        api_hash = input("Enter your API Hash: ")
-        phone_number = input("Enter your phone number: ")
+        api_id = await ainput("Enter your API ID: ")
+        api_hash = await ainput("Enter your API Hash: ")
+        phone_number = await ainput("Enter your phone number: ")
         write_credentials(api_id, api_hash, phone_number)
 
-    forwarder = TelegramForwarder(api_id, api_hash, phone_number)
+    forwarder = TelegramForwarder(api_id, api_hash, phone_number, read_extra_accounts())
+    if len(forwarder.pool) > 1:
+        print(f"Using {len(forwarder.pool)} accounts.")
+    if chats_file:
+        forwarder.load_chats_file(chats_file)
+    if metrics_port:
+        await start_keep_alive(forwarder.metrics, forwarder.health, port=metrics_port)
 
     while True:
         print("Choose an option:")
@@ -339,11 +855,11 @@ async def main():
         print("3. Stop Forwarding")
         print("4. Exit")
 
-        choice = input("Enter your choice: ")
+        choice = await ainput("Enter your choice: ")
 
         if choice == "1":
             await forwarder.list_chats()
-            input("Press any key to return to the main menu...")
+            await ainput("Press any key to return to the main menu...")
         elif choice == "2":
             # Show message types that the user can configure for forwarding
             print("\nChoose message types to forward:")
@@ -353,43 +869,44 @@ async def main():
             print("4. Cashtags")
             print("m. Return to Main Menu")
 
-            selected_message_types = input("Enter the numbers of the message types you want to forward (comma separated): ").split(",")
+            selected_message_types = (await ainput("Enter the numbers of the message types you want to forward (comma separated): ")).split(",")
             selected_message_types = [item.strip() for item in selected_message_types if item.strip()]
 
             # Start gathering configurations based on selected message types
             # -------------------------------------------------------------
             # Keywords Configuration
-            source_chats, destinations, keywords, keyword_timer = None, None, None, None
+            source_chats, destinations, keywords, keyword_timer, keyword_forward = None, None, None, None, False
             if '1' in selected_message_types:
-                source_chats = input("Enter the source chats for keywords (comma separated IDs or titles): ").split(",")
-                destinations = input("Enter the destinations for keywords (comma separated IDs or titles): ").split(",")
-                keywords = input("Enter keywords to forward messages with specific keywords (comma separated), or leave blank to forward every message: ").split(",")
+                source_chats = (await ainput("Enter the source chats for keywords (comma separated IDs or titles): ")).split(",")
+                destinations = (await ainput("Enter the destinations for keywords (comma separated IDs or titles): ")).split(",")
+                keywords = (await ainput("Enter keywords to forward messages with specific keywords (comma separated), or leave blank to forward every message: ")).split(",")
                 keywords = [keyword.strip() for keyword in keywords if keyword.strip()]  # Clean keywords
-                keyword_timer = input("Enter the timer for keywords (e.g., '10 minutes', '2 months'), or leave blank for no timer: ")
+                keyword_timer = await ainput("Enter the timer for keywords (e.g., '10 minutes', '1h30m', '2 weeks'), or leave blank for no timer: ")
+                keyword_forward = (await ainput("Forward the original messages, keeping media, formatting and albums? (y/N): ")).strip().lower() == "y"
 
             # Solana Contracts Configuration
             solana_source_chats, solana_destinations, solana_timer = None, None, None
             solana_enabled = '2' in selected_message_types
             if solana_enabled:
-                solana_source_chats = input("Enter the Solana source chats (comma separated): ").split(",")
-                solana_destinations = input("Enter the Solana contract destinations (comma separated): ").split(",")
-                solana_timer = input("Enter the timer for Solana contracts (e.g., '10 minutes', '2 months'), or leave blank for no timer: ")
+                solana_source_chats = (await ainput("Enter the Solana source chats (comma separated): ")).split(",")
+                solana_destinations = (await ainput("Enter the Solana contract destinations (comma separated): ")).split(",")
+                solana_timer = await ainput("Enter the timer for Solana contracts (e.g., '10 minutes', '1h30m', '2 weeks'), or leave blank for no timer: ")
 
             # Ethereum Contracts Configuration
             eth_source_chats, eth_destinations, eth_timer = None, None, None
             eth_enabled = '3' in selected_message_types
             if eth_enabled:
-                eth_source_chats = input("Enter the Ethereum source chats (comma separated): ").split(",")
-                eth_destinations = input("Enter the Ethereum contract destinations (comma separated): ").split(",")
-                eth_timer = input("Enter the timer for Ethereum contracts (e.g., '10 minutes', '2 months'), or leave blank for no timer: ")
+                eth_source_chats = (await ainput("Enter the Ethereum source chats (comma separated): ")).split(",")
+                eth_destinations = (await ainput("Enter the Ethereum contract destinations (comma separated): ")).split(",")
+                eth_timer = await ainput("Enter the timer for Ethereum contracts (e.g., '10 minutes', '1h30m', '2 weeks'), or leave blank for no timer: ")
 
             # Cashtag Configuration
             cashtag_source_chats, cashtag_destinations, cashtag_timer = None, None, None
             cashtag_enabled = '4' in selected_message_types
             if cashtag_enabled:
-                cashtag_source_chats = input("Enter the Cashtag source chats (comma separated): ").split(",")
-                cashtag_destinations = input("Enter the Cashtag destinations (comma separated): ").split(",")
-                cashtag_timer = input("Enter the timer for Cashtags (e.g., '10 minutes', '2 months'), or leave blank for no timer: ")
+                cashtag_source_chats = (await ainput("Enter the Cashtag source chats (comma separated): ")).split(",")
+                cashtag_destinations = (await ainput("Enter the Cashtag destinations (comma separated): ")).split(",")
+                cashtag_timer = await ainput("Enter the timer for Cashtags (e.g., '10 minutes', '1h30m', '2 weeks'), or leave blank for no timer: ")
 
             print("Forwarding job initiated with the following settings:")
             if '1' in selected_message_types:
@@ -401,81 +918,123 @@ async def main():
             if cashtag_enabled:
                 print(f"Cashtag Source Chats: {cashtag_source_chats}, Destinations: {cashtag_destinations}, Timer: {cashtag_timer}")
 
-            # Prepare tasks for concurrent execution of forwarding jobs
-            tasks = []
-
+            # Start the forwarding jobs; their watchers keep running in the background
             # Keywords Forwarding Job
             if '1' in selected_message_types:
-                tasks.append(forwarder.forward_messages_to_channel(
+                await forwarder.forward_messages_to_channel(
                     source_chats=source_chats,
                     destinations=destinations,
                     keywords=keywords,
-                    keyword_timer=keyword_timer
-                ))
+                    keyword_timer=keyword_timer,
+                    keyword_forward=keyword_forward
+                )
 
             # Solana Forwarding Job
             if solana_enabled:
-                tasks.append(forwarder.forward_messages_to_channel(
+                await forwarder.forward_messages_to_channel(
                     solana_enabled=True,
                     solana_source_chats=solana_source_chats,
                     solana_destinations=solana_destinations,
                     solana_timer=solana_timer
-                ))
+                )
 
             # Ethereum Forwarding Job
             if eth_enabled:
-                tasks.append(forwarder.forward_messages_to_channel(
+                await forwarder.forward_messages_to_channel(
                     eth_enabled=True,
                     eth_source_chats=eth_source_chats,
                     eth_destinations=eth_destinations,
                     eth_timer=eth_timer
-                ))
+                )
 
             # Cashtag Forwarding Job
             if cashtag_enabled:
-                tasks.append(forwarder.forward_messages_to_channel(
+                await forwarder.forward_messages_to_channel(
                     cashtag_enabled=True,
                     cashtag_source_chats=cashtag_source_chats,
                     cashtag_destinations=cashtag_destinations,
                     cashtag_timer=cashtag_timer
-                ))
-
-            # Await all tasks concurrently
-            if tasks:  # Check if there are tasks to run
-                print("Jobs are now running...")
-                for task in asyncio.as_completed(tasks):
-                    await task  # Wait for each task to complete
-                    # After each task, check if the user wants to return to the main menu
-                    user_input = input("Type 'm' to return to the main menu or any other key to continue: ").strip().lower()
-                    if user_input == 'm':
-                        print("Returning to the main menu...")
-                        break  # Exit the loop to return to the main menu
+                )
+
+            if forwarder.watchers.tasks:
+                print("Jobs are now running in the background. Use 'Stop Forwarding' to stop them.")
 
         elif choice == "3":
             # Stop Forwarding Jobs
-            if not forwarder.active_tasks:
+            jobs = forwarder.watchers.jobs()
+            if not jobs:
                 print("No active forwarding jobs to stop.")
-                input("Press any key to return to the main menu...")
+                await ainput("Press any key to return to the main menu...")
                 continue
 
             print("Currently running jobs:")
-            for idx, task in enumerate(forwarder.active_tasks):
-                print(f"{idx + 1}. Job {idx + 1}")  # Simple representation of job number
+            for idx, (job_name, watcher_names) in enumerate(jobs.items()):
+                print(f"{idx + 1}. {job_name} ({len(watcher_names)} watcher(s))")
+                for watcher_name in watcher_names:
+                    print(f"     {watcher_name}")
 
-            job_number = input("Enter the number of the job you want to stop: ")
-            if job_number.isdigit():
-                job_number = int(job_number) - 1  # Convert to zero-based index
-                await forwarder.stop_forwarding_job(job_number)
+            job = (await ainput("Enter the number of the job, or the name of a job or watcher, to stop: ")).strip()
+            if job.isdigit() and 0 < int(job) <= len(jobs):
+                job = list(jobs)[int(job) - 1]
+            if job:
+                await forwarder.stop_forwarding_job(job)
 
-            input("Press any key to return to the main menu...")
+            await ainput("Press any key to return to the main menu...")
 
         elif choice == "4":
             print("Exiting the application.")
+            await forwarder.close()
             break  # Exit the while loop
         else:
             print("Invalid choice")
-            input("Press any key to return to the main menu...")
+            await ainput("Press any key to return to the main menu...")
+
+async def run_daemon(config_path, metrics_port=None, chats_file=None):
+    """Runs the rules of a routing file without any prompts."""
+    api_id, api_hash, phone_number = read_credentials()
+    if api_id is None or api_hash is None or phone_number is None:
+        raise SystemExit("credentials.txt is required to run with --config.")
+
+    forwarder = TelegramForwarder(api_id, api_hash, phone_number, read_extra_accounts())
+    if len(forwarder.pool) > 1:
+        log.info("Using %d accounts.", len(forwarder.pool))
+    if chats_file:
+        forwarder.load_chats_file(chats_file)
+    if metrics_port:
+        await start_keep_alive(forwarder.metrics, forwarder.health, port=metrics_port)
+    try:
+        await forwarder.run_routing_file(config_path)
+    finally:
+        await forwarder.close()
+
+async def run_export(export_format):
+    """Saves the chat list of the account as chats_of_<phone>.jsonl or .csv and exits."""
+    api_id, api_hash, phone_number = read_credentials()
+    if api_id is None or api_hash is None or phone_number is None:
+        raise SystemExit("credentials.txt is required to run with --export-chats.")
+
+    forwarder = TelegramForwarder(api_id, api_hash, phone_number)
+    try:
+        await forwarder.list_chats(export_format, echo=False)
+    finally:
+        await forwarder.client.disconnect()
 
 # Start the event loop and run the main function
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Forward Telegram messages that match keywords, contracts or cashtags.")
+    parser.add_argument("--config", help="run without prompts, using the rules of this JSON, TOML or YAML routing file")
+    parser.add_argument("--metrics-port", type=int, help="serve /health and /metrics on this port")
+    parser.add_argument("--export-chats", choices=("jsonl", "csv"), help="save the chat list in this format and exit")
+    parser.add_argument("--chats-file", help="also look chat titles up in this chat list (JSON lines or CSV export)")
+    parser.add_argument("--log-file", default=LOG_FILE, help="JSON lines log file, rotated at 10 MB (default: %(default)s)")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args()
+    log_listener = setup_logging(args.log_file, args.log_level)
+    try:
+        if args.export_chats:
+            asyncio.run(run_export(args.export_chats))
+        else:
+            asyncio.run(run_daemon(args.config, args.metrics_port, args.chats_file) if args.config
+                        else main(args.metrics_port, args.chats_file))
+    finally:
+        log_listener.stop()
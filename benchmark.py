@@ -0,0 +1,345 @@
+"""
+Offline benchmark of the forwarding pipeline.
+
+Replays a synthetic (or recorded) message stream through TelegramForwarder
+against FakeTelegramClient, an in-process stand-in for TelegramClient, and
+reports throughput, forward latency, cooldown store growth and API calls per
+message. Nothing talks to Telegram, so runs are reproducible:
+
+    python benchmark.py --chats 50 --rate 500 --messages 20000
+    python benchmark.py --replay recorded.jsonl --flood-every 200
+
+A recorded stream is a JSON lines file of {"chat_id": ..., "text": ...} objects.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import string
+import tempfile
+import tracemalloc
+from collections import Counter
+
+from telethon import errors, events
+from telethon.tl.types import InputPeerChannel
+
+import TelegramForwarder as forwarder_module
+from logs import setup_logging
+from TelegramForwarder import TelegramForwarder
+
+BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+WORDS = ("gm", "wen", "launch", "chart", "pump", "holders", "dev", "locked", "liquidity", "burn",
+         "team", "moon", "presale", "stealth", "call", "entry", "target", "ape", "fud", "send")
+
+
+class FakeMessage:
+    def __init__(self, id, chat_id, text):
+        self.id = id
+        self.chat_id = chat_id
+        self.text = text
+        self.message = text
+        self.entities = None
+        self.grouped_id = None
+        self.media = None
+
+
+class FakeEvent:
+    def __init__(self, client, message):
+        self.client = client
+        self.chat_id = message.chat_id
+        self.message = message
+
+
+class FakeDialog:
+    def __init__(self, chat_id, title):
+        self.id = chat_id
+        self.title = title
+        self.name = title
+        self.entity = None
+        self.input_entity = InputPeerChannel(abs(chat_id), 0)
+
+
+class FakeTelegramClient:
+    """
+    In-process stand-in for TelegramClient. It keeps a message history per chat,
+    counts every API call, and raises FloodWaitError on every `flood_every`-th
+    send when asked to.
+    """
+
+    def __init__(self, session, api_id, api_hash, send_latency=0.0, flood_every=0, flood_seconds=1,
+                 protected=()):
+        self.session = session
+        self.send_latency = send_latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.protected = set(protected)  # Chats that raise ChatForwardsRestrictedError on forward
+        self.history = {}  # chat ID -> [FakeMessage]
+        self.handlers = []
+        self.calls = Counter()  # API method -> number of calls
+        self.sent = 0
+        self._connected = False
+        self._disconnected = None
+
+    def post(self, chat_id, text):
+        """Adds a message to a chat and returns it, without dispatching it."""
+        messages = self.history.setdefault(chat_id, [])
+        message = FakeMessage(len(messages) + 1, chat_id, text)
+        messages.append(message)
+        return message
+
+    def dispatch(self, message):
+        """Delivers a message to the NewMessage handlers in a task, as Telethon does for updates."""
+        event = FakeEvent(self, message)
+        for callback, event_builder in self.handlers:
+            if isinstance(event_builder, events.NewMessage):
+                asyncio.create_task(callback(event))
+
+    async def connect(self):
+        self.calls["connect"] += 1
+        self._connected = True
+        self._disconnected = asyncio.get_running_loop().create_future()
+
+    def is_connected(self):
+        return self._connected
+
+    async def is_user_authorized(self):
+        return True
+
+    @property
+    def disconnected(self):
+        return asyncio.shield(self._disconnected)
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self.handlers = [(handler, handler_event) for handler, handler_event in self.handlers if handler != callback]
+
+    async def get_messages(self, chat_id, limit=None, min_id=0, ids=None):
+        self.calls["get_messages"] += 1
+        if ids is not None:
+            history = self.history.get(chat_id, [])
+            return [history[message_id - 1] if 0 < message_id <= len(history) else None for message_id in ids]
+        messages = [message for message in self.history.get(chat_id, ()) if message.id > min_id][::-1]
+        return messages[:limit] if limit else messages
+
+    async def iter_messages(self, chat_id, limit=None, min_id=0, reverse=False):
+        self.calls["iter_messages"] += 1
+        messages = [message for message in self.history.get(chat_id, ()) if message.id > min_id]
+        for message in (messages if reverse else messages[::-1])[:limit]:
+            yield message
+
+    async def get_dialogs(self):
+        self.calls["get_dialogs"] += 1
+        return [FakeDialog(chat_id, f"Chat {chat_id}") for chat_id in self.history]
+
+    async def iter_dialogs(self):
+        for dialog in await self.get_dialogs():
+            yield dialog
+
+    async def get_input_entity(self, peer):
+        self.calls["get_input_entity"] += 1
+        return peer
+
+    async def _request(self, method, count=1):
+        self.calls[method] += 1
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        requests = self.calls["send_message"] + self.calls["forward_messages"]
+        if self.flood_every and requests % self.flood_every == 0:
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+        self.sent += count
+
+    async def send_message(self, entity, message, **kwargs):
+        await self._request("send_message")
+
+    async def forward_messages(self, entity, messages, from_peer=None):
+        if from_peer in self.protected:
+            self.calls["forward_messages"] += 1
+            raise errors.ChatForwardsRestrictedError(request=None)
+        await self._request("forward_messages", len(messages))
+
+
+def random_text(rng, keywords):
+    """A synthetic chat message: mostly chatter, sometimes a keyword, contract or cashtag."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(3, 25))]
+    roll = rng.random()
+    if roll < 0.10:
+        words.append(rng.choice(keywords))
+    elif roll < 0.15:
+        words.append("".join(rng.choice(BASE58) for _ in range(44)))
+    elif roll < 0.18:
+        words.append("0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)))
+    elif roll < 0.25:
+        words.append("$" + "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 5))))
+    return " ".join(words)
+
+
+def synthetic_stream(chats, count, keywords, seed):
+    rng = random.Random(seed)
+    chat_ids = [-1001000000000 - index for index in range(chats)]
+    for _ in range(count):
+        yield rng.choice(chat_ids), random_text(rng, keywords)
+
+
+def recorded_stream(path):
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield int(record["chat_id"]), record["text"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_benchmark(stream, keywords, rate, destinations, mode, send_latency, flood_every, send_rate,
+                        forward=False, drain_timeout=60):
+    stream = list(stream)
+    chat_ids = sorted({chat_id for chat_id, _ in stream})
+
+    clients = []
+
+    def client_factory(session, api_id, api_hash):
+        client = FakeTelegramClient(session, api_id, api_hash, send_latency, flood_every)
+        clients.append(client)
+        return client
+
+    forwarder = TelegramForwarder("0", "hash", "benchmark", client_factory=client_factory)
+    client = clients[0]
+    for chat_id in chat_ids:
+        client.history[chat_id] = []
+    forwarder.dispatcher.rate = send_rate
+    forwarder.dispatcher.burst = max(1, send_rate)
+    forwarder_module.POLL_INTERVAL = 0.05
+
+    latencies = []
+    latencies_by_priority = {}  # priority class -> latencies
+    record_sent = forwarder.dispatcher.on_sent
+
+    def on_sent(destination, received_at, priority):
+        latency = asyncio.get_running_loop().time() - received_at
+        latencies.append(latency)
+        latencies_by_priority.setdefault(priority, []).append(latency)
+        record_sent(destination, received_at, priority)
+
+    forwarder.dispatcher.on_sent = on_sent
+
+    destination_ids = [-1002000000000 - index for index in range(destinations)]
+    sources = [str(chat_id) for chat_id in chat_ids]
+    targets = [str(chat_id) for chat_id in destination_ids]
+    await forwarder.forward_messages_to_channel(
+        sources, targets, keywords,
+        solana_enabled=True, solana_source_chats=sources, solana_destinations=targets, solana_timer="1 hour",
+        eth_enabled=True, eth_source_chats=sources, eth_destinations=targets, eth_timer="1 hour",
+        cashtag_enabled=True, cashtag_source_chats=sources, cashtag_destinations=targets, cashtag_timer="10 minutes",
+        keyword_timer="10 minutes", ingestion_mode=mode, keyword_forward=forward,
+    )
+    # Let every watcher take its starting position (and subscribe, in events mode)
+    while len(forwarder.last_message_ids) < 4 * len(chat_ids) or (mode == "events" and len(forwarder.routes) < len(chat_ids)):
+        await asyncio.sleep(0.01)
+    client.calls.clear()
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    entries_before = len(forwarder.cooldowns)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for index, (chat_id, text) in enumerate(stream):
+        if rate:
+            delay = started + index / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        message = client.post(chat_id, text)
+        if mode == "events":
+            client.dispatch(message)
+    ingest_done = loop.time()
+
+    # Wait for every watcher to reach the last message of its chat, then for the send queues to empty
+    last_ids = {chat_id: len(messages) for chat_id, messages in client.history.items()}
+    while loop.time() - ingest_done < drain_timeout and any(
+            message_id < last_ids[int(name.rsplit("/", 1)[1])] for name, message_id in forwarder.last_message_ids.items()):
+        await asyncio.sleep(0.01)
+    try:
+        await forwarder.dispatcher.drain(timeout=drain_timeout)
+    except asyncio.TimeoutError:
+        pass  # A slow configuration still gets its report, with what was left as unsent_messages
+    finished = loop.time()
+    unsent = forwarder.dispatcher.queue_depth()
+
+    memory_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    await forwarder.close()
+
+    api_calls = sum(client.calls.values())
+    return {
+        "messages": len(stream),
+        "chats": len(chat_ids),
+        "destinations": destinations,
+        "mode": mode,
+        "elapsed_seconds": round(finished - started, 3),
+        "throughput_messages_per_second": round(len(stream) / (finished - started), 1),
+        "forwards_sent": client.sent,
+        "unsent_messages": unsent,
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "latency_p99_ms_by_priority": {priority: round(percentile(values, 0.99) * 1000, 2)
+                                       for priority, values in sorted(latencies_by_priority.items())},
+        "cooldown_entries_added": len(forwarder.cooldowns) - entries_before,
+        "traced_memory_growth_kib": round((memory_after - memory_before) / 1024, 1),
+        "api_calls": dict(client.calls),
+        "api_calls_per_message": round(api_calls / max(1, len(stream)), 3),
+        "send_stats": forwarder.dispatcher.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the forwarding pipeline.")
+    parser.add_argument("--chats", type=int, default=20, help="source chats in the synthetic stream")
+    parser.add_argument("--messages", type=int, default=5000, help="messages in the synthetic stream")
+    parser.add_argument("--replay", help="JSON lines file of {chat_id, text} to replay instead")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second to inject, 0 for as fast as possible")
+    parser.add_argument("--keywords", type=int, default=1000, help="number of keywords in the keyword rule")
+    parser.add_argument("--destinations", type=int, default=3)
+    parser.add_argument("--mode", choices=("events", "polling"), default="events")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="seconds each fake send takes")
+    parser.add_argument("--send-rate", type=float, default=1000.0, help="sends per second allowed per destination")
+    parser.add_argument("--flood-every", type=int, default=0, help="raise FloodWaitError on every Nth send")
+    parser.add_argument("--forward", action="store_true", help="forward keyword matches natively, in batches")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="seconds to wait after the last message for the send queues to empty")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--show-output", action="store_true", help="show the forwarder's log on the console")
+    args = parser.parse_args()
+
+    keywords = [f"kw{index}" for index in range(args.keywords)]
+    stream = (recorded_stream(args.replay) if args.replay
+              else synthetic_stream(args.chats, args.messages, keywords, args.seed))
+
+    # Session, cooldown, checkpoint and log files go to a scratch directory
+    with tempfile.TemporaryDirectory() as scratch:
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        # The same logging pipeline as the forwarder, so its cost is part of the measurement
+        log_listener = setup_logging("benchmark.log", console=args.show_output)
+        try:
+            report = asyncio.run(run_benchmark(
+                stream, keywords, args.rate, args.destinations, args.mode,
+                args.send_latency, args.flood_every, args.send_rate, args.forward, args.drain_timeout,
+            ))
+        finally:
+            log_listener.stop()
+            os.chdir(cwd)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import time
+
+
+class CheckpointStore:
+    """
+    Durably records the last processed message ID of each source chat.
+
+    Updates only touch memory; the whole map is written to `path` (temp file,
+    fsync, rename) at most once every `flush_interval` seconds, so a crash
+    loses at most that much progress and never leaves a torn file.
+    """
+
+    def __init__(self, path, flush_interval=2.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.positions = {}  # chat ID -> last processed message ID
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.positions = {int(chat_id): message_id for chat_id, message_id in json.load(file).items()}
+        self.dirty = False
+        self.last_flush = 0.0
+        self._flush_handle = None
+
+    def get(self, chat_id):
+        return self.positions.get(chat_id)
+
+    def update(self, chat_id, message_id):
+        """Moves the checkpoint of a chat forward; it never moves back."""
+        if chat_id in self.positions and message_id <= self.positions[chat_id]:
+            return  # A chat that was empty when first watched is still recorded, at 0
+        self.positions[chat_id] = message_id
+        self._changed()
+
+    def discard(self, chat_id):
+        """Forgets the checkpoint of a chat that is no longer watched, so it isn't backfilled when watched again."""
+        if self.positions.pop(chat_id, None) is not None:
+            self._changed()
+
+    def _changed(self):
+        self.dirty = True
+        wait = self.last_flush + self.flush_interval - time.monotonic()
+        if wait <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(wait, self.flush)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({str(chat_id): message_id for chat_id, message_id in self.positions.items()}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,261 @@
+import hashlib
+import sqlite3
+import time
+from collections import deque
+
+
+def hash_key(namespace, key):
+    """Hashes a namespaced key (message text, contract, cashtag) into a signed 64-bit integer."""
+    digest = hashlib.blake2b(f"{namespace}\0{key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class SQLiteBackend:
+    """Persists cooldown entries in a SQLite database in WAL mode."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cooldowns ("
+            "key INTEGER PRIMARY KEY, last_forwarded REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def load(self, now, limit):
+        """Returns up to `limit` unexpired (key, last_forwarded, expires_at) rows, the ones expiring last."""
+        return self.connection.execute(
+            "SELECT key, last_forwarded, expires_at FROM cooldowns WHERE expires_at > ? "
+            "ORDER BY expires_at DESC, last_forwarded DESC LIMIT ?", (now, limit)
+        ).fetchall()
+
+    def save(self, rows):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO cooldowns (key, last_forwarded, expires_at) VALUES (?, ?, ?)", rows
+        )
+        self.connection.commit()
+
+    def delete(self, keys):
+        self.connection.executemany("DELETE FROM cooldowns WHERE key = ?", [(key,) for key in keys])
+        self.connection.commit()
+
+    def delete_expired(self, now):
+        self.connection.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+WHEEL_BITS = 6
+WHEEL_SLOTS = 1 << WHEEL_BITS  # Slots per level of the timing wheel
+WHEEL_MASK = WHEEL_SLOTS - 1
+WHEEL_LEVELS = 5  # Slots of 1 second, ~1 minute, ~1 hour, ~2 days and ~4 months: 64**5 seconds is ~34 years
+TICK_MASK = (1 << 32) - 1  # Ticks are whole seconds and fit 32 bits until 2106
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel of keys by the tick they expire at.
+
+    Level n has WHEEL_SLOTS slots of 64**n ticks each. A key goes into the
+    coarsest level it needs, and whenever the finer level below comes round,
+    that level's next slot is cascaded down, so a key is moved at most
+    WHEEL_LEVELS times and advancing is amortized O(1) per key. Keys don't
+    carry their expiry: expires_of(key) looks it up, and returns None for a
+    key that is gone. A key whose expiry was pushed back since it was placed
+    is placed again instead of being reported.
+    """
+
+    __slots__ = ("tick", "expires_of", "levels", "counts")
+
+    def __init__(self, tick, expires_of):
+        self.tick = tick  # Every tick up to this one has been processed
+        self.expires_of = expires_of
+        self.levels = [[deque() for _ in range(WHEEL_SLOTS)] for _ in range(WHEEL_LEVELS)]
+        self.counts = [0] * WHEEL_LEVELS  # Keys in each level
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def add(self, key, expires):
+        self._place(key, max(expires, self.tick + 1))
+
+    def _place(self, key, expires):
+        # The coarsest level needed: level n holds keys due in less than 64**(n + 1) ticks
+        level = min(max((expires - self.tick).bit_length() - 1, 0) // WHEEL_BITS, WHEEL_LEVELS - 1)
+        self.levels[level][expires >> level * WHEEL_BITS & WHEEL_MASK].append(key)
+        self.counts[level] += 1
+
+    def _take(self, level, index):
+        keys = self.levels[level][index]
+        if keys:
+            self.levels[level][index] = deque()
+            self.counts[level] -= len(keys)
+        return keys
+
+    def advance(self, now):
+        """Processes every tick up to now and returns the keys that have expired."""
+        expired = []
+        while self.tick < now:
+            # Jump over the ticks where nothing can happen: up to the next slot of the finest non-empty level
+            empty = 0
+            while empty < WHEEL_LEVELS and not self.counts[empty]:
+                empty += 1
+            if empty == WHEEL_LEVELS:
+                self.tick = now
+                break
+            shift = empty * WHEEL_BITS
+            self.tick = min(now, ((self.tick >> shift) + 1) << shift)
+
+            # Cascade every level whose finer level just came round, coarsest first
+            for level in range(WHEEL_LEVELS - 1, 0, -1):
+                shift = level * WHEEL_BITS
+                if not self.tick & ((1 << shift) - 1):
+                    for key in self._take(level, self.tick >> shift & WHEEL_MASK):
+                        expires = self.expires_of(key)
+                        if expires is not None:
+                            self._place(key, max(expires, self.tick))
+            for key in self._take(0, self.tick & WHEEL_MASK):
+                expires = self.expires_of(key)
+                if expires is None:
+                    continue
+                if expires <= self.tick:
+                    expired.append(key)
+                else:
+                    self._place(key, expires)
+        return expired
+
+    def pop_soonest(self):
+        """Removes and returns the oldest key of the earliest non-empty slot, or None if the wheel is empty."""
+        for level in range(WHEEL_LEVELS):
+            if not self.counts[level]:
+                continue
+            start = (self.tick >> level * WHEEL_BITS) + 1
+            for offset in range(WHEEL_SLOTS):
+                keys = self.levels[level][(start + offset) & WHEEL_MASK]
+                if keys:
+                    self.counts[level] -= 1
+                    return keys.popleft()
+        return None
+
+
+class CooldownStore:
+    """
+    Remembers when each message, contract or cashtag was last forwarded.
+
+    Keys are namespaced by message type and stored as 64-bit hashes, so a
+    check is a single dict lookup whatever the size of the message. Times are
+    whole seconds on the monotonic clock, anchored to the Unix epoch when the
+    store is opened, and each entry packs its last forward and expiry into
+    one int. A TimingWheel drops entries as their cooldown passes; above
+    max_entries the ones closest to expiring are evicted. An optional backend
+    (SQLiteBackend) keeps them across restarts. Writes to the backend are
+    batched and flushed at most every flush_interval seconds.
+    """
+
+    def __init__(self, backend=None, max_entries=100_000, flush_interval=1.0, sweep_interval=60.0):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self._origin = time.time() - time.monotonic()  # now() is the Unix time, but never jumps with the clock
+        self.entries = {}  # hashed key -> last forwarded << 32 | expires at
+        self.pending = {}  # hashed key -> entry not written to the backend yet
+        self.evicted = set()  # hashed keys evicted from memory, to delete from the backend
+        now = self.now()
+        self.wheel = TimingWheel(now, self._expires_of)
+        self.last_flush = self.last_sweep = now
+
+        if backend is not None:
+            for key, last_forwarded, expires_at in backend.load(now, max_entries):
+                self.entries[key] = int(last_forwarded) << 32 | int(expires_at)
+                self.wheel.add(key, int(expires_at))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def now(self):
+        return int(time.monotonic() + self._origin)
+
+    def _expires_of(self, key):
+        entry = self.entries.get(key)
+        return None if entry is None else entry & TICK_MASK
+
+    def can_forward(self, namespace, key, cooldown):
+        """Returns True if `key` was not forwarded within the last `cooldown` seconds."""
+        entry = self.entries.get(hash_key(namespace, key))
+        if entry is None:
+            return True
+        return int(time.monotonic() + self._origin) - (entry >> 32) >= cooldown
+
+    def mark(self, namespace, key, cooldown, persist=True):
+        """
+        Records that `key` was forwarded now and keeps it for `cooldown` seconds.
+        With persist=False it is only written to the backend once persist() is
+        called, e.g. when the forward has actually been sent.
+        """
+        if cooldown <= 0:
+            return  # No cooldown, nothing to remember
+        now = int(time.monotonic() + self._origin)
+        if now > self.wheel.tick:
+            self._expire(now)
+        hashed = hash_key(namespace, key)
+        previous = self.entries.get(hashed)
+        expires_at = min(now + int(cooldown), TICK_MASK)  # Longer timers mean "never" and stop at 2106
+        if previous is None:
+            self.wheel.add(hashed, expires_at)  # A key already in the wheel is moved when its old slot comes up
+        else:
+            expires_at = max(expires_at, previous & TICK_MASK)
+        self.entries[hashed] = now << 32 | expires_at
+        self.evicted.discard(hashed)
+        if persist:
+            self.pending[hashed] = self.entries[hashed]
+
+        while len(self.entries) > self.max_entries:
+            evicted = self.wheel.pop_soonest()  # Evict an entry that expires soonest
+            del self.entries[evicted]
+            self.pending.pop(evicted, None)
+            self.evicted.add(evicted)
+
+        if now - self.last_sweep >= self.sweep_interval:
+            self.expire(now)
+        if now - self.last_flush >= self.flush_interval or len(self.pending) + len(self.evicted) >= 1000:
+            self.flush()
+
+    def persist(self, namespace, key):
+        """Queues the entry of a key marked with persist=False to be written to the backend."""
+        hashed = hash_key(namespace, key)
+        entry = self.entries.get(hashed)
+        if entry is not None:
+            self.pending[hashed] = entry
+
+    def _expire(self, now):
+        for key in self.wheel.advance(now):
+            del self.entries[key]
+            self.pending.pop(key, None)
+
+    def expire(self, now=None):
+        """Drops every entry whose cooldown has passed, here and in the backend."""
+        now = self.now() if now is None else now
+        self._expire(now)
+        self.last_sweep = now
+        if self.backend is not None:
+            self.backend.delete_expired(now)
+
+    def flush(self):
+        """Writes the pending entries to the backend, and deletes the evicted ones from it."""
+        self.last_flush = self.now()
+        if self.backend is not None:
+            if self.evicted:
+                self.backend.delete(self.evicted)
+            if self.pending:
+                self.backend.save([(key, entry >> 32, entry & TICK_MASK) for key, entry in self.pending.items()])
+        self.pending.clear()
+        self.evicted.clear()
+
+    def close(self):
+        self.flush()
+        if self.backend is not None:
+            self.backend.close()
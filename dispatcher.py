@@ -0,0 +1,331 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+from telethon import errors
+
+log = logging.getLogger(__name__)
+PREVIEW_LENGTH = 60  # Characters of a sent text that are logged
+
+# Priority class -> latency SLO in seconds. A message is due its SLO after it was received, and every
+# destination sends the message due first. Contracts overtake a backlog of bulk forwards, and a bulk
+# message still gets its turn once it has waited longer than the difference, so nothing starves.
+PRIORITY_SLOS = {
+    "contract": 1.0,
+    "cashtag": 10.0,
+    "bulk": 30.0,
+}
+DEFAULT_PRIORITY = "bulk"
+RESERVED_PRIORITY = "contract"  # The only class that may use the reserved queue slots and send tokens
+
+
+class TokenBucket:
+    """Allows `rate` sends per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+
+    def wait_time(self, now, reserve=0):
+        """Seconds until a token can be taken while leaving `reserve` tokens in the bucket, without taking it."""
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = 1 + min(reserve, self.capacity - 1)
+        return 0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, now, reserve=0):
+        """Takes a token and returns 0, or returns how many seconds to wait for the next one."""
+        wait = self.wait_time(now, reserve)
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class Forward:
+    """A source message to forward natively rather than re-send as text."""
+
+    __slots__ = ("chat_id", "message")
+
+    def __init__(self, chat_id, message):
+        self.chat_id = chat_id
+        self.message = message
+
+
+class SendQueue:
+    """
+    A destination's queue, ordered by when each message is due. Entries are
+    (due, insertion number, priority, message, queued at, log fields). The
+    last `reserved` of the `maxsize` slots only take RESERVED_PRIORITY
+    messages, so a burst of bulk forwards can't crowd out a contract.
+    """
+
+    def __init__(self, maxsize, reserved=0):
+        self.maxsize = maxsize
+        self.reserved = reserved
+        self.heap = []
+        self.unfinished = 0
+        self._counter = itertools.count()
+        self._put = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self):
+        return len(self.heap)
+
+    def head(self):
+        return self.heap[0] if self.heap else None
+
+    def put_nowait(self, priority, item, queued_at, context):
+        """Returns False if the queue has no slot left for this priority."""
+        limit = self.maxsize if priority == RESERVED_PRIORITY else self.maxsize - self.reserved
+        if len(self.heap) >= limit:
+            return False
+        due = queued_at + PRIORITY_SLOS.get(priority, PRIORITY_SLOS[DEFAULT_PRIORITY])
+        heapq.heappush(self.heap, (due, next(self._counter), priority, item, queued_at, context))
+        self.unfinished += 1
+        self._finished.clear()
+        self._put.set()
+        return True
+
+    def get_nowait(self):
+        return heapq.heappop(self.heap)
+
+    async def wait(self, timeout=None):
+        """Waits until another message is put, or for timeout seconds."""
+        self._put.clear()
+        try:
+            await asyncio.wait_for(self._put.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def task_done(self):
+        self.unfinished -= 1
+        if not self.unfinished:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+
+class SendDispatcher:
+    """
+    Sends outgoing messages without blocking the watchers.
+
+    Every destination gets its own bounded queue, token bucket and worker
+    task, so destinations are sent to concurrently. A destination that hits
+    FloodWait is parked: only its worker sleeps, then retries the message,
+    while every other destination keeps sending.
+
+    Each message has a priority class (see PRIORITY_SLOS) and a destination
+    sends whichever message is due first. While a worker waits for a token it
+    keeps watching its queue, so a contract that comes in meanwhile is the
+    next one sent. `reserved_tokens` of the bucket and `reserved_slots` of the
+    queue are left for RESERVED_PRIORITY messages during bursts.
+
+    Forwards are batched: once one is queued, the worker waits up to
+    `batch_window` seconds for more, then hands each source chat's messages
+    to `forward` in one call, taking one token per call instead of per message.
+    """
+
+    def __init__(self, send, rate=1.0, burst=5, max_queue=1000, max_retries=3, on_sent=None,
+                 forward=None, batch_window=1.0, max_batch=100, reserved_tokens=1, reserved_slots=100, on_done=None):
+        self.send = send  # async callable(destination, text)
+        self.forward = forward  # async callable(destination, source chat ID, messages)
+        # Optional callable(destination, queued_at, priority) called after each successful send
+        self.on_sent = on_sent
+        # Optional callable(destination, context) called once for every message that was sent or given up on
+        self.on_done = on_done
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.batch_window = batch_window
+        self.max_batch = max_batch  # Telegram forwards at most 100 messages per request
+        self.reserved_tokens = reserved_tokens
+        self.reserved_slots = min(reserved_slots, max_queue - 1)
+        self.queues = {}  # destination -> SendQueue
+        self.workers = {}  # destination -> worker task
+        self.parked_until = {}  # destination -> loop time when its FloodWait ends
+        self.sent = 0
+        self.dropped = 0
+        self.retried = 0
+        self.failed = 0
+        self.flood_wait_seconds = 0
+        self.slo_missed = {}  # priority class -> messages sent later than its SLO
+
+    def submit(self, destination, text, queued_at=None, context=None, priority=DEFAULT_PRIORITY):
+        """
+        Queues a message for a destination. queued_at is the loop time the message
+        was received, passed on to on_sent; it defaults to now. context is a dict of
+        fields (rule, source...) logged with the send, and priority one of
+        PRIORITY_SLOS. Returns False if the destination's queue was full and the
+        message was dropped. `text` can also be a Forward, to forward a source message
+        natively in the next batch.
+        """
+        queue = self.queues.get(destination)
+        if queue is None:
+            queue = self.queues[destination] = SendQueue(self.max_queue, self.reserved_slots)
+            self.workers[destination] = asyncio.create_task(self._worker(destination, queue))
+        queued_at = asyncio.get_running_loop().time() if queued_at is None else queued_at
+        if not queue.put_nowait(priority, text, queued_at, context):
+            self.dropped += 1
+            log.warning("Send queue for %s is full, dropping message.", destination,
+                        extra={"event": "dropped", "destination": destination, "priority": priority,
+                               "rate_key": ("dropped", destination)})
+            return False
+        return True
+
+    async def _next(self, loop, queue, bucket):
+        """Waits until the message due first can be sent without waiting for a token, and takes it off the queue."""
+        while True:
+            head = queue.head()
+            if head is None:
+                await queue.wait()
+                continue
+            priority = head[2]
+            wait = bucket.wait_time(loop.time(), 0 if priority == RESERVED_PRIORITY else self.reserved_tokens)
+            if not wait:
+                return queue.get_nowait()
+            await queue.wait(wait)  # A message due sooner may come in while waiting
+
+    async def _worker(self, destination, queue):
+        loop = asyncio.get_running_loop()
+        bucket = TokenBucket(self.rate, self.burst)
+        while True:
+            entry = await self._next(loop, queue, bucket)
+            _, _, priority, item, queued_at, context = entry
+            if not isinstance(item, Forward):
+                try:
+                    await self._deliver(loop, bucket, destination, self.send, (destination, item),
+                                        [(queued_at, context)], priority, item)
+                finally:
+                    queue.task_done()
+                continue
+
+            batch = [entry]
+            try:
+                await self._collect(loop, queue, batch)
+                # Plain sends picked up while collecting go first, by due time; forwards go per source chat
+                forwards = {}
+                for _, _, priority, item, queued_at, context in sorted(batch):
+                    if isinstance(item, Forward):
+                        forwards.setdefault((item.chat_id, priority), []).append((item.message, queued_at, context))
+                    else:
+                        await self._deliver(loop, bucket, destination, self.send, (destination, item),
+                                            [(queued_at, context)], priority, item)
+                for (chat_id, priority), messages in forwards.items():
+                    await self._deliver(loop, bucket, destination, self.forward,
+                                        (destination, chat_id, [message for message, _, _ in messages]),
+                                        [(queued_at, context) for _, queued_at, context in messages], priority)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _collect(self, loop, queue, batch):
+        """
+        Adds whatever is queued in the next batch_window seconds to batch, up to
+        max_batch items. Stops early when a RESERVED_PRIORITY message is waiting,
+        which is left on the queue to be sent right after the batch.
+        """
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            head = queue.head()
+            if head is not None:
+                if head[2] == RESERVED_PRIORITY:
+                    break
+                batch.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            await queue.wait(timeout)
+
+    async def _deliver(self, loop, bucket, destination, send, args, entries, priority, text=None):
+        """Sends with retries; entries are the (queued at, log fields) of the messages in this send."""
+        fields = {"destination": destination, "count": len(entries), "priority": priority, **(entries[0][1] or {})}
+        reserve = 0 if priority == RESERVED_PRIORITY else self.reserved_tokens
+        for attempt in range(self.max_retries + 1):
+            wait = bucket.take(loop.time(), reserve)
+            while wait:
+                await asyncio.sleep(wait)
+                wait = bucket.take(loop.time(), reserve)
+            try:
+                await send(*args)
+                self.sent += len(entries)
+                if self.on_sent:
+                    for queued_at, _ in entries:
+                        self.on_sent(destination, queued_at, priority)
+                now = loop.time()
+                latency_ms = round((now - min(queued_at for queued_at, _ in entries)) * 1000, 1)
+                if text is None:
+                    log.info("Forwarded %d message(s) to %s", len(entries), destination,
+                             extra={"event": "sent", "latency_ms": latency_ms, **fields})
+                else:
+                    log.info("Sent to %s: %s", destination, text[:PREVIEW_LENGTH],
+                             extra={"event": "sent", "latency_ms": latency_ms, "length": len(text), **fields})
+                slo = PRIORITY_SLOS.get(priority, PRIORITY_SLOS[DEFAULT_PRIORITY])
+                late = sum(1 for queued_at, _ in entries if now - queued_at > slo)
+                if late:
+                    self.slo_missed[priority] = self.slo_missed.get(priority, 0) + late
+                    log.warning("Sent %d %s message(s) to %s later than their %s second SLO", late, priority,
+                                destination, slo,
+                                extra={"event": "slo_missed", "latency_ms": latency_ms, "slo_seconds": slo, **fields,
+                                       "rate_key": ("slo_missed", destination, priority)})
+                self._done(destination, entries)
+                return
+            except errors.FloodWaitError as e:
+                self.flood_wait_seconds += e.seconds
+                if attempt == self.max_retries:
+                    break
+                # Park this destination only; the other workers keep going
+                log.warning("Flood wait on %s: retrying in %s seconds", destination, e.seconds,
+                            extra={"event": "flood_wait", "seconds": e.seconds, **fields,
+                                   "rate_key": ("flood_wait", destination)})
+                self.retried += 1
+                self.parked_until[destination] = loop.time() + e.seconds
+                await asyncio.sleep(e.seconds)
+                self.parked_until.pop(destination, None)
+            except Exception as e:
+                log.error("An error occurred while forwarding the message to %s: %s", destination, e,
+                          extra={"event": "send_failed", "error": repr(e), **fields,
+                                 "rate_key": ("send_failed", destination)})
+                break
+        self.failed += len(entries)
+        self._done(destination, entries)
+
+    def _done(self, destination, entries):
+        if self.on_done:
+            for _, context in entries:
+                self.on_done(destination, context)
+
+    def queue_depth(self):
+        return sum(queue.qsize() for queue in self.queues.values())
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "failed": self.failed,
+            "flood_wait_seconds": self.flood_wait_seconds,
+            "parked_destinations": len(self.parked_until),
+            "slo_missed": dict(self.slo_missed),
+        }
+
+    async def drain(self, timeout=None):
+        """Waits until every queued message has been handled, or until the timeout."""
+        joins = [queue.join() for queue in self.queues.values()]
+        if joins:
+            await asyncio.wait_for(asyncio.gather(*joins), timeout)
+
+    async def stop(self):
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
@@ -1,14 +1,152 @@
-#from http.server import BaseHTTPRequestHandler, HTTPServer
-
-#class KeepAliveHandler(BaseHTTPRequestHandler):
-    #def do_GET(self):
-        #self.send_response(200)
-        #self.send_header('Content-type', 'text/plain')
-        #self.end_headers()
-        #self.wfile.write(b"I'm alive")
-
-#def start_keep_alive():
-    #server_address = ('', 8080)
-    #httpd = HTTPServer(server_address, KeepAliveHandler)
-    #print('Keep alive server running on port 8080...')
-    #httpd.serve_forever()
+import asyncio
+import bisect
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Seconds
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values -> count
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+
+class Gauge:
+    """
+    A value read from `function` every time the metrics are scraped. With
+    kind="counter" it exposes a total that is counted somewhere else.
+    """
+
+    def __init__(self, name, help, function, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, self.function()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self):
+        for labels, state in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield self.name + "_bucket" + _format_labels(self.labelnames, labels, [("le", bound)]), cumulative
+            yield self.name + "_bucket" + _format_labels(self.labelnames, labels, [("le", "+Inf")]), state[-1]
+            yield self.name + "_sum" + _format_labels(self.labelnames, labels), state[-2]
+            yield self.name + "_count" + _format_labels(self.labelnames, labels), state[-1]
+
+
+class Metrics:
+    """Registry of metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, function, kind="gauge"):
+        return self._add(Gauge(name, help, function, kind))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {value}" for sample, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+async def _handle_request(reader, writer, metrics, health_check):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 10)
+        while (await asyncio.wait_for(reader.readline(), 10)) not in (b"\r\n", b"\n", b""):
+            pass  # Headers are not needed
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+
+        if path == "/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", metrics.render()
+        elif path == "/health":
+            healthy, details = health_check()
+            status = "200 OK" if healthy else "503 Service Unavailable"
+            content_type, body = "application/json", json.dumps(details)
+        elif path == "/":
+            status, content_type, body = "200 OK", "text/plain", "I'm alive"
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", "Not found"
+
+        body = body.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_keep_alive(metrics, health_check, host="", port=8080):
+    """
+    Serves "/" (I'm alive), "/metrics" (Prometheus text format) and "/health"
+    on the running event loop. health_check() returns (healthy, details) and
+    "/health" answers 503 when it isn't healthy.
+    """
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_request(reader, writer, metrics, health_check), host or None, port
+    )
+    log.info("Keep alive server running on port %s...", port)
+    return server
@@ -0,0 +1,89 @@
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+# Attributes every LogRecord has; anything else was passed in `extra` and goes into the JSON object
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "rate_key"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the fields passed in `extra`."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records with the same `rate_key` (passed in `extra`)
+    through every `interval` seconds. The next record let through carries how
+    many were dropped in between as "suppressed". Records without a rate_key
+    are never limited.
+    """
+
+    def __init__(self, burst=5, interval=60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.windows = {}  # rate key -> [window start, records let through, records suppressed]
+
+    def filter(self, record):
+        key = getattr(record, "rate_key", None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            window = self.windows[key] = [now, 0, 0]
+            if suppressed:
+                record.suppressed = suppressed
+        if window[1] >= self.burst:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+
+def setup_logging(path="forwarder.log", level=logging.INFO, max_bytes=10 * 1024 * 1024, backups=5, console=True):
+    """
+    Sends every log record through a queue to a background thread, which
+    writes JSON lines to `path` (rotated every `max_bytes`) and, with
+    console, plain messages to stderr. Logging calls only put the record on
+    the queue, so a slow disk or terminal never blocks the event loop.
+    Returns the QueueListener; stop it on exit to flush what is left.
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    handlers = []
+    if path:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                            encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(message)s"))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    logging.getLogger("telethon").setLevel(max(level, logging.WARNING))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
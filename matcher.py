@@ -0,0 +1,129 @@
+import re
+
+SOLANA_PATTERN = r'[1-9A-HJ-NP-Za-km-z]{32,44}'  # Base58 regex for Solana contract address
+ETHEREUM_PATTERN = r'0x[a-fA-F0-9]{40}'  # Regex for Ethereum contract address
+CASHTAG_PATTERN = r'\$[A-Za-z][A-Za-z0-9]{0,9}'  # $TICKER, must start with a letter so prices don't match
+
+# Every address-like token in one regex, so a message is scanned once for all of them.
+# The lookarounds keep matches on whole tokens instead of slices of longer words.
+TOKEN_REGEX = re.compile(
+    rf'(?<![0-9A-Za-z])'
+    rf'(?:(?P<ethereum>{ETHEREUM_PATTERN})|(?P<solana>{SOLANA_PATTERN})|(?P<cashtag>{CASHTAG_PATTERN}))'
+    rf'(?![0-9A-Za-z])'
+)
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a set of keywords. find() walks the text once,
+    so its cost depends on the text length and not on the number of keywords.
+    """
+
+    def __init__(self, keywords):
+        self.goto = [{}]  # state -> {character: next state}
+        self.fail = [0]  # state -> fallback state
+        self.output = [()]  # state -> keywords that end in this state
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            if keyword not in self.output[state]:
+                self.output[state] += (keyword,)
+
+        # Breadth-first pass to link every state to its longest proper suffix
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] += self.output[self.fail[next_state]]
+                queue.append(next_state)
+
+    def find(self, text):
+        """Returns the set of keywords that occur anywhere in text."""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class Matches:
+    """Everything a single message matched: keyword rule names, contracts and cashtags."""
+
+    __slots__ = ("rules", "solana", "ethereum", "cashtags")
+
+    def __init__(self, rules=(), solana=(), ethereum=(), cashtags=()):
+        self.rules = rules
+        self.solana = solana
+        self.ethereum = ethereum
+        self.cashtags = cashtags
+
+
+NO_MATCHES = Matches()
+
+
+def find_tokens(text):
+    """Returns the distinct (solana, ethereum, cashtags) tokens of text, in order of appearance."""
+    found = {"solana": {}, "ethereum": {}, "cashtag": {}}
+    for match in TOKEN_REGEX.finditer(text):
+        found[match.lastgroup][match.group()] = None
+    return list(found["solana"]), list(found["ethereum"]), list(found["cashtag"])
+
+
+class MatcherEngine:
+    """
+    Matches messages against the keywords of every keyword rule at once.
+
+    Keywords are compiled into one case-insensitive Aho-Corasick automaton
+    shared by all rules; a rule without keywords matches every message,
+    including media without a caption.
+    """
+
+    def __init__(self):
+        self.keyword_rules = {}  # rule name -> keywords
+        self.rules_by_keyword = {}  # keyword -> rule names
+        self.match_all_rules = frozenset()
+        self.automaton = None
+
+    def set_keywords(self, rule, keywords):
+        self.keyword_rules[rule] = [keyword.lower() for keyword in keywords or () if keyword]
+        self._compile()
+
+    def remove_rule(self, rule):
+        if self.keyword_rules.pop(rule, None) is not None:
+            self._compile()
+
+    def _compile(self):
+        self.rules_by_keyword = {}
+        for rule, keywords in self.keyword_rules.items():
+            for keyword in keywords:
+                self.rules_by_keyword.setdefault(keyword, set()).add(rule)
+        self.match_all_rules = frozenset(rule for rule, keywords in self.keyword_rules.items() if not keywords)
+        self.automaton = KeywordAutomaton(self.rules_by_keyword) if self.rules_by_keyword else None
+
+    def scan(self, text):
+        """Scans text once and returns its Matches."""
+        if not text:
+            return Matches(self.match_all_rules) if self.match_all_rules else NO_MATCHES
+        rules = set(self.match_all_rules)
+        if self.automaton:
+            for keyword in self.automaton.find(text.lower()):
+                rules.update(self.rules_by_keyword[keyword])
+        solana, ethereum, cashtags = find_tokens(text)
+        return Matches(rules, solana, ethereum, cashtags)
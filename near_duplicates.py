@@ -0,0 +1,115 @@
+import hashlib
+import heapq
+import itertools
+import re
+import time
+import unicodedata
+
+URL_PATTERN = re.compile(r"(?:https?://|www\.|t\.me/)\S+", re.IGNORECASE)
+MENTION_PATTERN = re.compile(r"@\w+")
+APOSTROPHE_PATTERN = re.compile(r"['\u2019`]")
+NON_WORD_PATTERN = re.compile(r"[^\w$]+")  # Punctuation, emoji and whitespace; $ is kept for cashtags
+SHINGLE_SIZE = 4  # Characters per shingle
+BANDS = 4  # Bands the 64-bit fingerprint is indexed by
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def canonicalize(text):
+    """
+    Reduces a message to what makes it the same post: Unicode compatibility
+    forms, lower case, no links or @mentions, and no punctuation, emoji or
+    extra whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = URL_PATTERN.sub(" ", text)
+    text = MENTION_PATTERN.sub(" ", text)
+    text = APOSTROPHE_PATTERN.sub("", text)  # "it's" and "its" are the same word
+    return NON_WORD_PATTERN.sub(" ", text).strip()
+
+
+def simhash(text):
+    """64-bit SimHash of the character shingles of a canonical text. Similar texts differ in few bits."""
+    if len(text) <= SHINGLE_SIZE:
+        shingles = [text]
+    else:
+        shingles = {text[index:index + SHINGLE_SIZE] for index in range(len(text) - SHINGLE_SIZE + 1)}
+    # Each bit is set when most shingle hashes have it set; counting the columns of the bit strings is fast
+    bits = [format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+            for shingle in shingles]
+    half = len(bits) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in zip(*bits)), 2)
+
+
+class NearDuplicateIndex:
+    """
+    Remembers the fingerprints of recently forwarded messages, per rule, to
+    spot the same post coming again with small edits (emoji, links, spacing)
+    from any source chat.
+
+    Two texts are near duplicates when their SimHashes differ in at most
+    max_distance bits. Fingerprints are split into BANDS bands and indexed by
+    each band, so with max_distance < BANDS a near duplicate always shares at
+    least one band and a lookup only compares a handful of candidates.
+    Fingerprints are forgotten once their window has passed.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.buckets = {}  # (namespace, band, band value) -> set of fingerprints
+        self.expiry = []  # Heap of (expires at, insertion number, namespace, fingerprint)
+        self.suppressed = 0
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.expiry)
+
+    @staticmethod
+    def _bands(fingerprint):
+        return [(band, fingerprint >> (band * BAND_BITS) & BAND_MASK) for band in range(BANDS)]
+
+    def check(self, namespace, text, window):
+        """
+        Returns True if text is a near duplicate of one seen in namespace within
+        the last `window` seconds. Otherwise it is remembered for `window`
+        seconds and False is returned.
+        """
+        now = time.monotonic()
+        self.expire(now)
+        canonical = canonicalize(text)
+        if not canonical or window <= 0:
+            return False
+        fingerprint = simhash(canonical)
+        bands = self._bands(fingerprint)
+        for band, value in bands:
+            for candidate in self.buckets.get((namespace, band, value), ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    self.suppressed += 1
+                    return True
+
+        for band, value in bands:
+            self.buckets.setdefault((namespace, band, value), set()).add(fingerprint)
+        heapq.heappush(self.expiry, (now + window, next(self._counter), namespace, fingerprint))
+        return False
+
+    def expire(self, now=None):
+        """Forgets the fingerprints whose window has passed."""
+        now = time.monotonic() if now is None else now
+        while self.expiry and self.expiry[0][0] <= now:
+            _, _, namespace, fingerprint = heapq.heappop(self.expiry)
+            self._remove(namespace, fingerprint)
+
+    def _remove(self, namespace, fingerprint):
+        for band, value in self._bands(fingerprint):
+            bucket = self.buckets.get((namespace, band, value))
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del self.buckets[(namespace, band, value)]
+
+    def forget(self, namespace):
+        """Drops every fingerprint of a namespace, e.g. a rule that was stopped."""
+        self.expiry = [entry for entry in self.expiry if entry[2] != namespace]
+        heapq.heapify(self.expiry)
+        for key in [key for key in self.buckets if key[0] == namespace]:
+            del self.buckets[key]
@@ -0,0 +1,153 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+
+from telethon import TelegramClient, utils
+from telethon.tl.types import PeerChannel
+
+log = logging.getLogger(__name__)
+
+
+def has_shared_message_ids(chat_id):
+    """
+    True for channels and supergroups, whose message IDs are the same for every
+    account. Basic groups and private chats number messages per account.
+    """
+    return utils.resolve_id(chat_id)[1] is PeerChannel
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing of keys (source chat IDs) onto nodes (accounts), with virtual nodes."""
+
+    def __init__(self, nodes, replicas=64):
+        self.ring = sorted((_hash(f"{node}#{replica}"), node) for node in nodes for replica in range(replicas))
+        self.hashes = [point for point, _ in self.ring]
+
+    def get(self, key, allowed=None):
+        """Returns the node owning key, skipping nodes not in `allowed`. None if no node is allowed."""
+        if not self.ring:
+            return None
+        start = bisect.bisect(self.hashes, _hash(key))
+        for index in range(start, start + len(self.ring)):
+            node = self.ring[index % len(self.ring)][1]
+            if allowed is None or node in allowed:
+                return node
+        return None
+
+
+class ClientPool:
+    """
+    One or more Telegram accounts used together.
+
+    Source chats are spread over the accounts by consistent hashing, so adding
+    or losing an account only moves its own share of chats. Accounts that are
+    disconnected or flood-limited are skipped until they recover, but only for
+    channels and supergroups: other chats number their messages per account,
+    so they stay with one account and wait for it to come back. Sends go
+    round-robin over the available accounts that are members of the destination.
+    With a single account everything simply uses that account.
+    """
+
+    def __init__(self, accounts, client_factory=TelegramClient):
+        self.clients = {}  # phone number -> client
+        for api_id, api_hash, phone_number in accounts:
+            self.clients[phone_number] = client_factory('session_' + phone_number, api_id, api_hash)
+        self.primary = next(iter(self.clients.values()))
+        self.ring = HashRing(self.clients)
+        self.members = {}  # phone number -> chat IDs of its dialogs, once loaded
+        self.input_entities = {}  # phone number -> {chat ID: input entity}
+        self.limited_until = {}  # phone number -> loop time when its FloodWait ends
+        self.changed = asyncio.Event()
+        self._round_robin = itertools.count()
+
+    def __len__(self):
+        return len(self.clients)
+
+    def phone_of(self, client):
+        for phone_number, pool_client in self.clients.items():
+            if pool_client is client:
+                return phone_number
+        return None
+
+    def available(self):
+        """Phone numbers of the accounts that are connected and not flood-limited."""
+        now = asyncio.get_running_loop().time()
+        return {phone_number for phone_number, client in self.clients.items()
+                if client.is_connected() and self.limited_until.get(phone_number, 0) <= now}
+
+    def _members(self, chat_id):
+        """The accounts in a chat, or every account if none of them is known to be."""
+        members = {phone_number for phone_number in self.clients
+                   if phone_number not in self.members or chat_id in self.members[phone_number]}
+        return members or set(self.clients)
+
+    def _candidates(self, chat_id):
+        if len(self.clients) == 1:
+            return set(self.clients)
+        members = self._members(chat_id)
+        return (members & self.available()) or members
+
+    def client_for_chat(self, chat_id):
+        """The account that reads a source chat."""
+        if not has_shared_message_ids(chat_id):
+            return self.clients[self.ring.get(chat_id, self._members(chat_id))]
+        return self.clients[self.ring.get(chat_id, self._candidates(chat_id))]
+
+    def sender_for(self, destination, exclude=()):
+        """An account to send to destination with, rotating over the available members."""
+        candidates = sorted(self._candidates(destination) - set(exclude))
+        if not candidates:
+            return None
+        return self.clients[candidates[next(self._round_robin) % len(candidates)]]
+
+    async def input_entity(self, client, chat_id):
+        """The input entity of a chat for one account, looked up only the first time."""
+        entities = self.input_entities.setdefault(self.phone_of(client), {})
+        if chat_id not in entities:
+            entities[chat_id] = await client.get_input_entity(chat_id)
+        return entities[chat_id]
+
+    def mark_flood_limited(self, client, seconds):
+        """Takes an account out of rotation for `seconds` after a FloodWaitError."""
+        phone_number = self.phone_of(client)
+        self.limited_until[phone_number] = asyncio.get_running_loop().time() + seconds
+        log.warning("Account %s is flood-limited for %s seconds, rebalancing.", phone_number, seconds,
+                    extra={"event": "account_flood_limited", "account": phone_number, "seconds": seconds,
+                           "rate_key": ("account_flood_limited", phone_number)})
+        self.rebalance()
+
+    def rebalance(self):
+        """Wakes up the watchers in wait_for_change so they pick their accounts again."""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def load_dialogs(self):
+        """Learns which chats each account is in. Only needed with more than one account."""
+        if len(self.clients) == 1:
+            return
+        for phone_number, client in self.clients.items():
+            entities = self.input_entities.setdefault(phone_number, {})
+            async for dialog in client.iter_dialogs():
+                entities[dialog.id] = dialog.input_entity
+            self.members[phone_number] = set(entities)
+        self.rebalance()
+
+    async def wait_for_change(self, client):
+        """Waits until `client` disconnects (returns True) or the pool is rebalanced (returns False)."""
+        disconnected = asyncio.ensure_future(client.disconnected)
+        changed = asyncio.ensure_future(self.changed.wait())
+        try:
+            done, _ = await asyncio.wait({disconnected, changed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnected.cancel()
+            changed.cancel()
+        return disconnected in done
+
+    def all_connected(self):
+        return all(client.is_connected() for client in self.clients.values())
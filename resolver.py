@@ -0,0 +1,279 @@
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import tempfile
+
+from telethon import errors, events, utils
+from telethon.tl.types import Channel, Chat, User
+
+EXPORT_FIELDS = ("id", "title", "username", "type", "members")
+EXPORT_PAGE_SIZE = 500  # Dialogs written (and printed) at a time by export_dialogs
+LINK_PREFIXES = ("t.me/", "telegram.me/", "telegram.dog/")
+
+
+def is_explicit_reference(name):
+    """
+    Whether name can only mean one chat: "me", an @username or a t.me link. A bare
+    title could also parse as a public username and match a stranger's account.
+    """
+    name = name.strip().lower()
+    if name == "me" or name.startswith("@"):
+        return True
+    for scheme in ("https://", "http://"):
+        if name.startswith(scheme):
+            name = name[len(scheme):]
+            break
+    if name.startswith("www."):
+        name = name[4:]
+    return name.startswith(LINK_PREFIXES)
+
+
+def chat_type(entity):
+    """One of "user", "bot", "group", "supergroup" or "channel"."""
+    if isinstance(entity, User):
+        return "bot" if entity.bot else "user"
+    if isinstance(entity, Chat):
+        return "group"
+    if isinstance(entity, Channel):
+        return "supergroup" if entity.megagroup else "channel"
+    return None
+
+
+def chat_fields(entity):
+    """The exported fields of a chat entity, as stored in the resolver's cache file."""
+    return {
+        "id": utils.get_peer_id(entity),
+        "title": utils.get_display_name(entity),
+        "username": getattr(entity, "username", None),
+        "type": chat_type(entity),
+        "members": getattr(entity, "participants_count", None),
+    }
+
+
+@contextlib.contextmanager
+def _replacing(path, buffering=-1):
+    """
+    Yields a new temp file next to path, which replaces path once the block
+    completes and is deleted if it fails. Every writer gets its own temp file,
+    so an export and a cache save of the same path can't clobber each other.
+    """
+    file = tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", buffering=buffering, delete=False,
+                                       dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                       suffix=".tmp")
+    try:
+        with file:
+            yield file
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(file.name)
+        raise
+
+
+def read_chats(path):
+    """Yields the chats of a JSON lines or CSV export one at a time, as dicts of EXPORT_FIELDS."""
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(file):
+                yield {
+                    "id": int(row["id"]),
+                    "title": row.get("title") or None,
+                    "username": row.get("username") or None,
+                    "type": row.get("type") or None,
+                    "members": int(row["members"]) if row.get("members") else None,
+                }
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+async def export_dialogs(client, path, page_size=EXPORT_PAGE_SIZE, on_page=None):
+    """
+    Streams every dialog of client to path, as JSON lines or as CSV if path ends
+    in ".csv", and returns how many were written. Only one page of rows is held
+    at a time: each page is written from a worker thread while the next one is
+    fetched, and the file replaces path once complete. on_page(rows) is called
+    with every page, e.g. to print it.
+    """
+    loop = asyncio.get_running_loop()
+    count = 0
+    with _replacing(path, buffering=1 << 16) as file:
+        writer = csv.DictWriter(file, EXPORT_FIELDS) if path.endswith(".csv") else None
+        if writer:
+            writer.writeheader()
+
+        def write(rows):
+            if writer:
+                writer.writerows(rows)
+            else:
+                file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+        rows = []
+        pending = None  # Write of the previous page, still running
+        async for dialog in client.iter_dialogs():
+            rows.append(chat_fields(dialog.entity))
+            if len(rows) >= page_size:
+                if pending:
+                    await pending
+                pending = loop.run_in_executor(None, write, rows)
+                if on_page:
+                    on_page(rows)
+                count += len(rows)
+                rows = []
+        if pending:
+            await pending
+        if rows:
+            await loop.run_in_executor(None, write, rows)
+            if on_page:
+                on_page(rows)
+            count += len(rows)
+    return count
+
+
+class ChatResolver:
+    """
+    Resolves chat IDs, titles and usernames to chat IDs and input entities.
+
+    Dialogs are loaded once into an index keyed by ID, lowercased title and
+    lowercased username, saved to `cache_path` (one JSON object per line) for
+    a fast warm start, and kept up to date from ChatAction updates. The full
+    dialog list is only fetched again when a name can't be found. Names that
+    aren't dialogs are left to Telethon to resolve, and remembered, but only in
+    an explicit form ("me", an @username or a t.me link): a bare title never
+    falls back to a public username lookup.
+    """
+
+    def __init__(self, client, cache_path=None):
+        self.client = client
+        self.cache_path = cache_path
+        self.chats = {}  # chat ID -> {"id", "title", "username", "type", "members"}
+        self.by_title = {}  # lowercased title -> chat ID
+        self.by_username = {}  # lowercased username -> chat ID
+        self.input_entities = {}  # chat ID -> input entity used for sending
+        self.aliases = {}  # lowercased name resolved by Telethon ("me", links) -> chat ID
+        self.loaded = False
+        self.refreshed = False  # Whether the dialogs were fetched from Telegram this session
+        self._lock = asyncio.Lock()
+        self._watching = False
+
+    def add(self, chat_id, title, username=None, **fields):
+        """Adds or updates one chat in the index."""
+        previous = self.chats.get(chat_id)
+        if previous:
+            if previous.get("title"):
+                self.by_title.pop(previous["title"].lower(), None)
+            if previous.get("username"):
+                self.by_username.pop(previous["username"].lower(), None)
+        self.chats[chat_id] = dict(id=chat_id, title=title, username=username, **fields)
+        if title:
+            self.by_title[title.lower()] = chat_id
+        if username:
+            self.by_username[username.lower()] = chat_id
+
+    def add_entity(self, entity, input_entity=None):
+        fields = chat_fields(entity)
+        chat_id = fields.pop("id")
+        self.add(chat_id, fields.pop("title"), fields.pop("username"), **fields)
+        if input_entity is not None:
+            self.input_entities[chat_id] = input_entity
+        return chat_id
+
+    def load_cache(self):
+        """Loads the index saved by a previous run. Returns the number of chats in the index."""
+        self.loaded = True
+        if self.cache_path and os.path.exists(self.cache_path):
+            self._add_chats(self.cache_path)
+        return len(self.chats)
+
+    def load_export(self, path):
+        """
+        Adds the chats of an export (JSON lines or CSV, as written by export_dialogs)
+        to the index, on top of the saved one. Returns the number of chats in the index.
+        """
+        if not self.loaded:
+            self.load_cache()
+        self._add_chats(path)
+        return len(self.chats)
+
+    def _add_chats(self, path):
+        for chat in read_chats(path):
+            self.add(chat.pop("id"), chat.pop("title", None), chat.pop("username", None), **chat)
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        if not self.loaded:
+            self.load_cache()  # Don't drop the chats of a cache that was never read
+        with _replacing(self.cache_path) as file:
+            for chat in self.chats.values():
+                file.write(json.dumps(chat, ensure_ascii=False) + "\n")
+
+    async def refresh(self):
+        """Fetches every dialog from Telegram and rebuilds the index."""
+        async with self._lock:
+            async for dialog in self.client.iter_dialogs():
+                self.add_entity(dialog.entity, dialog.input_entity)
+            self.refreshed = True
+            self.save_cache()
+
+    def _lookup(self, name):
+        name = name.lower()
+        if name in self.aliases:
+            return self.aliases[name]
+        if name.startswith("@"):
+            return self.by_username.get(name[1:])
+        return self.by_title.get(name, self.by_username.get(name))
+
+    async def resolve(self, chat):
+        """Returns the chat ID for an ID, title or username. Raises ValueError if it can't be found."""
+        if isinstance(chat, int):
+            return chat
+        chat = chat.strip()
+        if chat.lstrip('-').isdigit():
+            return int(chat)
+        if not self.loaded:
+            self.load_cache()
+        chat_id = self._lookup(chat)
+        if chat_id is None and not self.refreshed:
+            await self.refresh()  # Might be a chat we joined since the index was saved
+            chat_id = self._lookup(chat)
+        if chat_id is None:
+            chat_id = await self._resolve_remote(chat)
+        return chat_id
+
+    async def _resolve_remote(self, name):
+        """Asks Telegram for an @username, link or "me" that isn't in the dialogs, and caches the chat."""
+        if not is_explicit_reference(name):
+            raise ValueError(f"Chat with title '{name}' not found.")
+        try:
+            entity = await self.client.get_entity(name)
+        except (ValueError, TypeError, errors.RPCError):
+            raise ValueError(f"Chat with title '{name}' not found.") from None
+        chat_id = self.add_entity(entity, utils.get_input_peer(entity))
+        self.aliases[name.lower()] = chat_id
+        self.save_cache()
+        return chat_id
+
+    async def input_entity(self, chat_id):
+        """Returns the cached input entity for a chat, looking it up only the first time."""
+        input_entity = self.input_entities.get(chat_id)
+        if input_entity is None:
+            input_entity = self.input_entities[chat_id] = await self.client.get_input_entity(chat_id)
+        return input_entity
+
+    def watch(self):
+        """Keeps the index up to date as chats are joined or renamed."""
+        if not self._watching:
+            self.client.add_event_handler(self._on_chat_action, events.ChatAction())
+            self._watching = True
+
+    async def _on_chat_action(self, event):
+        # Only renamed chats and chats missing from the index, not every member joining
+        if event.new_title or event.chat_id not in self.chats:
+            chat = await event.get_chat()
+            if chat is not None:
+                self.add_entity(chat, await event.get_input_chat())
+                self.save_cache()
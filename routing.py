@@ -0,0 +1,91 @@
+import json
+import os
+
+MESSAGE_TYPES = ("keywords", "solana", "ethereum", "cashtags")
+
+
+class Rule:
+    """One forwarding rule from a routing file."""
+
+    __slots__ = ("name", "type", "sources", "destinations", "keywords", "cooldown", "forward")
+
+    def __init__(self, name, type, sources, destinations, keywords=(), cooldown=None, forward=False):
+        self.name = name
+        self.type = type
+        self.sources = tuple(sources)
+        self.destinations = tuple(destinations)
+        self.keywords = tuple(keywords)
+        self.cooldown = cooldown
+        self.forward = forward  # Keyword rules only: forward the original messages instead of their text
+
+    def _key(self):
+        return (self.name, self.type, self.sources, self.destinations, self.keywords, self.cooldown, self.forward)
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.type!r}, sources={list(self.sources)}, destinations={list(self.destinations)})"
+
+
+def _as_list(value):
+    """Accepts either a list or a comma separated string, like the interactive prompts."""
+    if value is None:
+        return []
+    if isinstance(value, (str, int)):
+        value = str(value).split(",")
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def parse_rules(data):
+    """Validates the parsed contents of a routing file and returns its Rules."""
+    if not isinstance(data, dict) or not isinstance(data.get("rules"), list):
+        raise ValueError("Routing file must contain a list of 'rules'.")
+    rules = []
+    names = set()
+    for index, entry in enumerate(data["rules"]):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Rule {index + 1} must be a table/object.")
+        name = str(entry.get("name") or f"rule{index + 1}")
+        if "/" in name:
+            raise ValueError(f"Rule name '{name}' can't contain '/'.")
+        if name in names:
+            raise ValueError(f"Duplicate rule name '{name}'.")
+        names.add(name)
+        rule_type = entry.get("type")
+        if rule_type not in MESSAGE_TYPES:
+            raise ValueError(f"Rule '{name}' has type {rule_type!r}, expected one of {', '.join(MESSAGE_TYPES)}.")
+        sources, destinations = _as_list(entry.get("sources")), _as_list(entry.get("destinations"))
+        if not sources or not destinations:
+            raise ValueError(f"Rule '{name}' needs at least one source and one destination.")
+        cooldown = entry.get("cooldown")
+        forward = entry.get("forward", False)
+        if not isinstance(forward, bool):
+            raise ValueError(f"Rule '{name}' has forward = {forward!r}, expected true or false.")
+        if forward and rule_type != "keywords":
+            raise ValueError(f"Rule '{name}': only keyword rules can forward the original messages.")
+        rules.append(Rule(name, rule_type, sources, destinations,
+                          _as_list(entry.get("keywords")), str(cooldown) if cooldown else None, forward))
+    return rules
+
+
+def load_routing_file(path):
+    """Reads a JSON, TOML or YAML routing file and returns its Rules."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as file:
+        content = file.read()
+    if extension == ".toml":
+        import tomllib
+        data = tomllib.loads(content.decode("utf-8"))
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML routing files need PyYAML: pip install pyyaml") from None
+        data = yaml.safe_load(content)
+    else:
+        data = json.loads(content)
+    return parse_rules(data)
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The forwarder's modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Stands in for the time module: both clocks stay put until a test moves `now`."""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(request, monkeypatch):
+    """
+    A FakeClock patched in as the `time` of the module given as the fixture's
+    parameter: @pytest.mark.parametrize("clock", [module], indirect=True).
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(request.param, "time", clock)
+    return clock
@@ -0,0 +1,32 @@
+from checkpoints import CheckpointStore
+
+
+def test_checkpoints_only_move_forward(tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    store = CheckpointStore(path, flush_interval=0)
+    store.update(-1001, 5)
+    store.update(-1001, 3)
+    store.update(-1001, 8)
+    store.close()
+    assert CheckpointStore(path).get(-1001) == 8
+
+
+def test_checkpoint_of_an_empty_chat_is_kept(tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    store = CheckpointStore(path, flush_interval=0)
+    store.update(-1001, 0)
+    store.close()
+    store = CheckpointStore(path)
+    assert store.get(-1001) == 0
+    assert store.get(-1002) is None
+
+
+def test_discarded_checkpoint_is_gone_after_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.json")
+    store = CheckpointStore(path, flush_interval=0)
+    store.update(-1001, 0)
+    store.update(-1002, 4)
+    store.discard(-1001)
+    store.discard(-1003)
+    store.close()
+    assert CheckpointStore(path).positions == {-1002: 4}
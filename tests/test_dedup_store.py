@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import dedup_store
+from dedup_store import CooldownStore, SQLiteBackend, TimingWheel
+
+
+uses_clock = pytest.mark.parametrize("clock", [dedup_store], indirect=True)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_wheel_expires_every_key_once_and_never_early(seed):
+    rng = random.Random(seed)
+    expires = {}  # key -> expiry tick, as the store keeps it
+    wheel = TimingWheel(0, expires.get)
+    now = 0
+    for step in range(3000):
+        key = rng.randrange(500)
+        if key in expires:
+            expires[key] = max(expires[key], now + rng.choice([1, 50, 5000]))  # Pushed back, as mark() does
+        else:
+            expires[key] = now + rng.choice([1, 2, 63, 64, 65, 4095, 4096, 300_000, 20_000_000])
+            wheel.add(key, expires[key])
+        now += rng.choice([0, 1, 1, 7, 64, 1000, 100_000])
+        due = {key for key, tick in expires.items() if tick <= now}
+        expired = wheel.advance(now)
+        assert len(expired) == len(set(expired))
+        assert set(expired) == due
+        for key in expired:
+            del expires[key]
+        assert len(wheel) == len(expires)
+
+
+def test_wheel_pops_soonest_first():
+    expires = {"late": 5000, "soon": 3, "middle": 70}
+    wheel = TimingWheel(0, expires.get)
+    for key, tick in expires.items():
+        wheel.add(key, tick)
+    assert [wheel.pop_soonest() for _ in range(4)] == ["soon", "middle", "late", None]
+
+
+@uses_clock
+def test_store_matches_brute_force(clock):
+    rng = random.Random(19)
+    store = CooldownStore(max_entries=10 ** 9)
+    reference = {}  # key -> (last forwarded, expires at)
+    for step in range(3000):
+        clock.now += rng.choice([0, 0.3, 1, 5, 70, 5000, 300_000]) * rng.random()
+        now = store.now()
+        key = str(rng.randrange(300))
+        cooldown = rng.choice([1, 10, 100, 4000, 300_000])
+        assert store.can_forward("rule", key, cooldown) == (key not in reference or now - reference[key][0] >= cooldown)
+        if rng.random() < 0.5:
+            store.mark("rule", key, cooldown)
+            previous = reference.get(key)
+            reference[key] = (now, max(now + cooldown, previous[1]) if previous else now + cooldown)
+        store.expire(now)
+        reference = {key: entry for key, entry in reference.items() if entry[1] > now}
+        assert len(store) == len(reference)
+
+
+@uses_clock
+def test_store_reloads_what_it_kept(clock, tmp_path):
+    path = str(tmp_path / "cooldowns.db")
+    store = CooldownStore(SQLiteBackend(path), max_entries=100)
+    for index in range(1000):
+        store.mark("solana", f"a{index}", 600)
+    assert len(store) == 100
+    assert not store.can_forward("solana", "a999", 600)
+    store.close()
+
+    store = CooldownStore(SQLiteBackend(path), max_entries=100)
+    assert len(store) == 100
+    assert store.backend.connection.execute("SELECT COUNT(*) FROM cooldowns").fetchone()[0] == 100
+    assert not store.can_forward("solana", "a999", 600)
+    store.close()
+
+
+@uses_clock
+def test_store_persists_deferred_marks_only_when_asked(clock, tmp_path):
+    path = str(tmp_path / "cooldowns.db")
+    store = CooldownStore(SQLiteBackend(path))
+    store.mark("solana", "queued", 600, persist=False)
+    store.mark("solana", "sent", 600, persist=False)
+    store.persist("solana", "sent")
+    assert not store.can_forward("solana", "queued", 600)
+    store.close()
+
+    store = CooldownStore(SQLiteBackend(path))
+    assert store.can_forward("solana", "queued", 600)
+    assert not store.can_forward("solana", "sent", 600)
+    store.close()
+
+
+@uses_clock
+def test_store_keeps_timers_past_the_32_bit_range(clock, tmp_path):
+    NEVER = 999 * 365 * 86400  # "999 years", well past 2106
+    path = str(tmp_path / "cooldowns.db")
+    store = CooldownStore(SQLiteBackend(path))
+    store.mark("r:solana", "B", NEVER)
+    assert not store.can_forward("r:solana", "B", NEVER)
+    store.close()
+
+    store = CooldownStore(SQLiteBackend(path))
+    assert not store.can_forward("r:solana", "B", NEVER)
+    assert store.backend.connection.execute("SELECT expires_at FROM cooldowns").fetchone()[0] == dedup_store.TICK_MASK
+    clock.now += 86400
+    store.expire()
+    assert len(store) == 1
+    store.close()
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from dispatcher import PRIORITY_SLOS, SendQueue
+
+
+def drain(queue):
+    return [queue.get_nowait()[3] for _ in range(queue.qsize())]
+
+
+def test_queue_sends_the_message_due_first():
+    queue = SendQueue(100)
+    queue.put_nowait("bulk", "bulk 1", 0.0, None)
+    queue.put_nowait("cashtag", "cashtag", 0.0, None)
+    queue.put_nowait("bulk", "bulk 2", 0.0, None)
+    queue.put_nowait("contract", "contract", 5.0, None)
+    assert drain(queue) == ["contract", "cashtag", "bulk 1", "bulk 2"]
+
+
+def test_queue_lets_old_bulk_messages_go_before_new_contracts():
+    queue = SendQueue(100)
+    queue.put_nowait("bulk", "old bulk", 0.0, None)
+    late = PRIORITY_SLOS["bulk"] - PRIORITY_SLOS["contract"] + 1
+    queue.put_nowait("contract", "late contract", late, None)
+    assert drain(queue) == ["old bulk", "late contract"]
+
+
+def test_queue_keeps_reserved_slots_for_contracts():
+    queue = SendQueue(5, reserved=2)
+    assert [queue.put_nowait("bulk", index, 0.0, None) for index in range(4)] == [True, True, True, False]
+    assert not queue.put_nowait("cashtag", "cashtag", 0.0, None)
+    assert queue.put_nowait("contract", "contract 1", 0.0, None)
+    assert queue.put_nowait("contract", "contract 2", 0.0, None)
+    assert not queue.put_nowait("contract", "contract 3", 0.0, None)
+    assert queue.qsize() == 5
+
+
+def test_queue_join_waits_for_every_message():
+    async def run():
+        queue = SendQueue(10)
+        await asyncio.wait_for(queue.join(), 1)
+        queue.put_nowait("bulk", "a", 0.0, None)
+        queue.put_nowait("contract", "b", 0.0, None)
+        drain(queue)
+        queue.task_done()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(queue.join(), 0.01)
+        queue.task_done()
+        await asyncio.wait_for(queue.join(), 1)
+
+    asyncio.run(run())
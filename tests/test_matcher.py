@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from matcher import KeywordAutomaton, MatcherEngine
+
+SOLANA = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+ETHEREUM = "0x52908400098527886E0F7030069857D2E4169EE7"
+
+
+@pytest.mark.parametrize("keywords, text, found", [
+    (["he", "she", "his", "hers"], "ushers", {"he", "she", "hers"}),
+    (["a", "ab", "bab", "bc", "bca", "c", "caa"], "abccab", {"a", "ab", "bc", "c"}),
+    (["moon", "moonshot"], "to the moonsho", {"moon"}),
+    (["pump"], "nothing here", set()),
+    (["x"], "", set()),
+])
+def test_automaton_finds_overlapping_keywords(keywords, text, found):
+    assert KeywordAutomaton(keywords).find(text) == found
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_automaton_matches_substring_search(seed):
+    rng = random.Random(seed)
+    keywords = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(40)}
+    automaton = KeywordAutomaton(keywords)
+    for _ in range(200):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+        assert automaton.find(text) == {keyword for keyword in keywords if keyword in text}
+
+
+def test_engine_matches_rules_case_insensitively():
+    engine = MatcherEngine()
+    engine.set_keywords("launches", ["Launch", "stealth"])
+    engine.set_keywords("pumps", ["PUMP"])
+    assert engine.scan("Stealth LAUNCH soon").rules == {"launches"}
+    assert engine.scan("pump it").rules == {"pumps"}
+    assert engine.scan("launch and pump").rules == {"launches", "pumps"}
+    assert not engine.scan("quiet day").rules
+
+
+def test_engine_rule_without_keywords_matches_every_message():
+    engine = MatcherEngine()
+    engine.set_keywords("everything", [])
+    engine.set_keywords("launches", ["launch"])
+    assert engine.scan("hello").rules == {"everything"}
+    assert engine.scan("launch").rules == {"everything", "launches"}
+    assert engine.scan("").rules == {"everything"}  # Media without a caption
+    assert engine.scan(None).rules == {"everything"}
+
+
+def test_engine_matches_no_rule_for_text_less_messages_without_a_match_all_rule():
+    engine = MatcherEngine()
+    engine.set_keywords("launches", ["launch"])
+    assert not engine.scan("").rules
+
+
+def test_engine_forgets_removed_rules():
+    engine = MatcherEngine()
+    engine.set_keywords("launches", ["launch"])
+    engine.set_keywords("also", ["launch"])
+    engine.remove_rule("launches")
+    assert engine.scan("launch").rules == {"also"}
+    engine.remove_rule("also")
+    assert engine.automaton is None
+    assert not engine.scan("launch").rules
+
+
+def test_engine_extracts_whole_distinct_tokens_in_order():
+    engine = MatcherEngine()
+    matches = engine.scan(f"$BONK at {SOLANA}, eth {ETHEREUM} and {SOLANA} again, $5 off, $WIF")
+    assert matches.solana == [SOLANA]
+    assert matches.ethereum == [ETHEREUM]
+    assert matches.cashtags == ["$BONK", "$WIF"]
+
+
+def test_engine_ignores_slices_of_longer_tokens():
+    matches = MatcherEngine().scan(f"x{SOLANA} {ETHEREUM}ff $TOOLONGTICKER")
+    assert not matches.solana
+    assert not matches.ethereum
+    assert not matches.cashtags
@@ -0,0 +1,66 @@
+import pytest
+
+import near_duplicates
+from near_duplicates import NearDuplicateIndex, canonicalize, simhash
+
+POST = "🚀 New gem launching today! Join https://t.me/gemcall now, it's going to fly @caller"
+LONG_POST = ("New gem launching today on Raydium. Liquidity is locked for a year, the team is doxxed, the contract "
+             "is renounced and the community has been growing all week. Join now, it is going to fly")
+
+
+uses_clock = pytest.mark.parametrize("clock", [near_duplicates], indirect=True)
+
+
+@pytest.mark.parametrize("text, canonical", [
+    ("Hello,   World!!", "hello world"),
+    ("ＦＵＬＬＷＩＤＴＨ ｔｅｘｔ", "fullwidth text"),
+    ("see https://example.com/x?y=1 and www.example.org", "see and"),
+    ("ping @someone now", "ping now"),
+    ("it's its it’s", "its its its"),
+    ("buy $WIF 🚀🚀", "buy $wif"),
+    ("🚀🔥", ""),
+    (None, ""),
+])
+def test_canonicalize(text, canonical):
+    assert canonicalize(text) == canonical
+
+
+def test_near_copies_share_a_fingerprint_and_others_do_not():
+    copy = "NEW GEM LAUNCHING TODAY!!! join https://t.me/other now... its going to fly 🔥"
+    other = "Weekly market recap: volumes were down across every major pair"
+    assert canonicalize(POST) == canonicalize(copy)
+    assert (simhash(canonicalize(POST)) ^ simhash(canonicalize(other))).bit_count() > 3
+
+
+@uses_clock
+def test_index_suppresses_near_copies_within_the_window(clock):
+    index = NearDuplicateIndex()
+    assert not index.check("rule", POST, 300)
+    assert index.check("rule", "New gem launching today. Join now, it's going to fly!!", 300)
+    assert not index.check("rule", "Something else entirely, nothing to do with gems", 300)
+    assert not index.check("rule", LONG_POST, 300)
+    assert index.check("rule", LONG_POST.replace("year", "yr"), 300)  # Not the same text, but a few bits apart
+    assert index.suppressed == 2
+
+    clock.now += 300
+    assert not index.check("rule", POST, 300)
+
+
+@uses_clock
+def test_index_keeps_rules_apart(clock):
+    index = NearDuplicateIndex()
+    assert not index.check("first", POST, 300)
+    assert not index.check("second", POST, 300)
+    index.forget("first")
+    assert not index.check("first", POST, 300)
+    assert index.check("second", POST, 300)
+
+
+@uses_clock
+def test_index_never_suppresses_empty_texts_or_without_a_window(clock):
+    index = NearDuplicateIndex()
+    assert not index.check("rule", "🚀🚀", 300)
+    assert not index.check("rule", "🚀🚀", 300)
+    assert not index.check("rule", POST, 0)
+    assert not index.check("rule", POST, 0)
+    assert len(index) == 0
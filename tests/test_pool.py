@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from pool import ClientPool, has_shared_message_ids
+
+CHANNELS = [-1001000000000 - index for index in range(50)]
+GROUPS = [-100000 - index for index in range(50)]
+
+
+class FakeClient:
+    def __init__(self, session, api_id, api_hash):
+        self.session = session
+
+    def is_connected(self):
+        return True
+
+
+def test_only_channels_share_message_ids():
+    assert has_shared_message_ids(-1001234567890)
+    assert not has_shared_message_ids(-123456)
+    assert not has_shared_message_ids(777000)
+
+
+def test_flood_limit_moves_channels_but_not_groups():
+    async def run():
+        pool = ClientPool([("1", "a", "first"), ("2", "b", "second")], FakeClient)
+        before = {chat_id: pool.client_for_chat(chat_id) for chat_id in CHANNELS + GROUPS}
+        first = pool.clients["first"]
+        pool.mark_flood_limited(first, 60)
+        assert all(pool.client_for_chat(chat_id) is not first for chat_id in CHANNELS)
+        assert any(before[chat_id] is first for chat_id in CHANNELS)
+        assert all(pool.client_for_chat(chat_id) is before[chat_id] for chat_id in GROUPS)
+
+    asyncio.run(run())
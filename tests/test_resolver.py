@@ -0,0 +1,55 @@
+import asyncio
+import csv
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from resolver import EXPORT_FIELDS, ChatResolver, is_explicit_reference
+
+
+class FakeClient:
+    def __init__(self):
+        self.lookups = []
+
+    async def iter_dialogs(self):
+        return
+        yield
+
+    async def get_entity(self, name):
+        self.lookups.append(name)
+        raise ValueError(f"No user has {name!r} as username")
+
+
+@pytest.mark.parametrize("name, explicit", [
+    ("me", True),
+    ("@alpha", True),
+    ("t.me/alpha", True),
+    ("https://t.me/+AbCdEf", True),
+    ("Alpha", False),
+    ("My_Alerts", False),
+])
+def test_explicit_references(name, explicit):
+    assert is_explicit_reference(name) == explicit
+
+
+def test_unknown_title_is_not_looked_up_as_a_username():
+    client = FakeClient()
+    resolver = ChatResolver(client)
+    with pytest.raises(ValueError):
+        asyncio.run(resolver.resolve("Alpha"))
+    assert client.lookups == []
+
+
+def test_titles_resolve_from_a_csv_export(tmp_path):
+    export = str(tmp_path / "chats.csv")
+    with open(export, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, EXPORT_FIELDS)
+        writer.writeheader()
+        writer.writerow({"id": -1001234567890, "title": "Alpha Calls", "username": "alphacalls", "type": "channel",
+                         "members": 1200})
+    resolver = ChatResolver(FakeClient(), str(tmp_path / "cache.jsonl"))
+    assert resolver.load_export(export) == 1
+    assert asyncio.run(resolver.resolve("alpha calls")) == -1001234567890
+    assert asyncio.run(resolver.resolve("@AlphaCalls")) == -1001234567890
+    assert not resolver.refreshed
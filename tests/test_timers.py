@@ -0,0 +1,29 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("telethon")
+
+from TelegramForwarder import parse_timer
+
+
+@pytest.mark.parametrize("timer, seconds", [
+    ("90", 90),
+    ("90s", 90),
+    ("10 minutes", 600),
+    ("1h30m", 5400),
+    ("1.5 hours", 5400),
+    ("1 day and 3 hours", 97200),
+    ("1 week, 2 days", 9 * 86400),
+    ("2 months", 60 * 86400),
+    ("  2 Weeks ", 14 * 86400),
+    ("999 months", 999 * 30 * 86400),
+])
+def test_parse_timer(timer, seconds):
+    assert parse_timer(timer) == datetime.timedelta(seconds=seconds)
+
+
+@pytest.mark.parametrize("timer", ["soon", "10 parsecs", "1h and then", "m5", "-5m"])
+def test_parse_timer_rejects_invalid_timers(timer, caplog):
+    assert parse_timer(timer) == datetime.timedelta()
+    assert "Invalid timer" in caplog.text
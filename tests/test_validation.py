@@ -0,0 +1,126 @@
+import hashlib
+import random
+
+import pytest
+
+from validation import (
+    ED25519_D, ED25519_P, _keccak_f, b58decode, is_on_ed25519_curve, is_valid_ethereum_address,
+    is_valid_solana_address, keccak256, validate_batch,
+)
+
+# Reference addresses from EIP-55
+EIP55_ADDRESSES = [
+    "0x52908400098527886E0F7030069857D2E4169EE7",
+    "0x8617E340B3D01FA5F11F306F4090FD50E238070D",
+    "0xde709f2102306220921060314715629080e2fb77",
+    "0x27b1fdb04752bbc536007a920d24acb045561c26",
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed",
+    "0xfB6916095ca1df60bB79Ce92cE3Ea74c37c5d359",
+    "0xdbF03B407c01E7cD3CBea99509d93f8DDDC8C6FB",
+    "0xD1220A0cf47c7B9Be7A2E6BA89F429762e7b9aDb",
+]
+
+
+def sha3_256(data):
+    """SHA3-256 built on validation's permutation: the same sponge as keccak256, with SHA3's padding."""
+    rate = 136
+    padded = bytearray(data) + b"\x06" + b"\0" * (-(len(data) + 1) % rate)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for start in range(0, len(padded), rate):
+        for index in range(rate // 8):
+            state[index] ^= int.from_bytes(padded[start + index * 8:start + index * 8 + 8], "little")
+        _keccak_f(state)
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
+
+
+def recover_x(y):
+    """The x of an ed25519 point from its y as in RFC 8032 section 5.1.3, or None if there is none."""
+    u = (y * y - 1) % ED25519_P
+    v = (ED25519_D * y * y + 1) % ED25519_P
+    x = u * pow(v, 3, ED25519_P) * pow(u * pow(v, 7, ED25519_P), (ED25519_P - 5) // 8, ED25519_P) % ED25519_P
+    if v * x * x % ED25519_P == u:
+        return x
+    if v * x * x % ED25519_P == -u % ED25519_P:
+        return x * pow(2, (ED25519_P - 1) // 4, ED25519_P) % ED25519_P
+    return None
+
+
+@pytest.mark.parametrize("data, digest", [
+    (b"", "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"),
+    (b"abc", "4e03657aea45a94fc7d47ba826c8d667c0d1e6e33a64a036ec44f58fa12d6c45"),
+])
+def test_keccak256_vectors(data, digest):
+    assert keccak256(data).hex() == digest
+
+
+@pytest.mark.parametrize("length", [0, 1, 135, 136, 137, 271, 272, 1000])
+def test_keccak_permutation_matches_sha3(length):
+    data = random.Random(length).randbytes(length)
+    assert sha3_256(data) == hashlib.sha3_256(data).digest()
+
+
+@pytest.mark.parametrize("address", EIP55_ADDRESSES)
+def test_eip55_reference_addresses(address):
+    assert is_valid_ethereum_address(address)
+
+
+@pytest.mark.parametrize("address", EIP55_ADDRESSES[4:])
+def test_eip55_rejects_a_flipped_letter(address):
+    index = next(index for index, char in enumerate(address) if index > 1 and char.isalpha())
+    assert not is_valid_ethereum_address(address[:index] + address[index].swapcase() + address[index + 1:])
+
+
+@pytest.mark.parametrize("address", [
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeA",  # Too short
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAedd",  # Too long
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAeg",  # Not hex
+    "1x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed",
+])
+def test_ethereum_rejects_malformed(address):
+    assert not is_valid_ethereum_address(address)
+
+
+@pytest.mark.parametrize("text, data", [
+    ("StV1DL6CwTryKyV", b"hello world"),
+    ("1112", b"\0\0\0\x01"),
+    ("11111111111111111111111111111111", b"\0" * 32),
+    ("", b""),
+])
+def test_b58decode_vectors(text, data):
+    assert b58decode(text) == data
+
+
+@pytest.mark.parametrize("text", ["0", "O", "I", "l", "abc+"])
+def test_b58decode_rejects_other_characters(text):
+    with pytest.raises(ValueError):
+        b58decode(text)
+
+
+def test_ed25519_base_point_is_on_curve():
+    base_point = bytes.fromhex("5866666666666666666666666666666666666666666666666666666666666666")
+    assert is_on_ed25519_curve(base_point)
+
+
+def test_ed25519_curve_check_matches_rfc8032_decoding():
+    rng = random.Random(8032)
+    results = set()
+    for _ in range(300):
+        public_key = rng.randbytes(32)
+        y = int.from_bytes(public_key, "little") & ((1 << 255) - 1)
+        on_curve = is_on_ed25519_curve(public_key)
+        assert on_curve == (recover_x(y % ED25519_P) is not None)
+        results.add(on_curve)
+    assert results == {True, False}  # Both cases were covered
+
+
+def test_solana_addresses():
+    assert is_valid_solana_address("EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v")  # USDC mint
+    assert is_valid_solana_address("6p6xgHyF7AeE6TZkSmFsko444wqoP15icUSqi2jfGiPN")  # TRUMP mint, off the curve
+    assert not is_on_ed25519_curve(b58decode("6p6xgHyF7AeE6TZkSmFsko444wqoP15icUSqi2jfGiPN"))
+    assert not is_valid_solana_address("EPjFWdd5AufqSSqeM2qN1xzybapC8")  # Not 32 bytes
+    assert not is_valid_solana_address("0PjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v")  # Not base58
+
+
+def test_validate_batch():
+    assert validate_batch([("ethereum", EIP55_ADDRESSES[4]), ("solana", "0" * 44)]) == [True, False]
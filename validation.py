@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+# Curve25519 in Edwards form: -x^2 + y^2 = 1 + d*x^2*y^2 over GF(2^255 - 19)
+ED25519_P = 2 ** 255 - 19
+ED25519_D = -121665 * pow(121666, ED25519_P - 2, ED25519_P) % ED25519_P
+
+KECCAK_ROUND_CONSTANTS = (
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+)
+KECCAK_ROTATIONS = (  # Lane x + 5*y
+    0, 1, 62, 28, 27,
+    36, 44, 6, 55, 20,
+    3, 10, 43, 25, 39,
+    41, 45, 15, 21, 8,
+    18, 2, 61, 56, 14,
+)
+MASK_64 = (1 << 64) - 1
+
+
+def b58decode(text):
+    """Decodes a base58 string (Bitcoin/Solana alphabet). Raises ValueError on other characters."""
+    value = 0
+    for char in text:
+        digit = BASE58_INDEX.get(char)
+        if digit is None:
+            raise ValueError(f"Invalid base58 character {char!r}")
+        value = value * 58 + digit
+    leading_zeros = len(text) - len(text.lstrip("1"))
+    return b"\0" * leading_zeros + value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+
+def is_on_ed25519_curve(public_key):
+    """
+    True if 32 bytes are the compressed form of a point on the ed25519 curve,
+    as keypair addresses are and program derived addresses are not.
+    """
+    y = int.from_bytes(public_key, "little") & ((1 << 255) - 1)
+    y_squared = y * y % ED25519_P
+    # x^2 = (y^2 - 1) / (d*y^2 + 1); the point exists if that has a square root
+    x_squared = (y_squared - 1) * pow(ED25519_D * y_squared + 1, ED25519_P - 2, ED25519_P) % ED25519_P
+    return x_squared == 0 or pow(x_squared, (ED25519_P - 1) // 2, ED25519_P) == 1
+
+
+def is_valid_solana_address(address):
+    """
+    A Solana address is a base58 encoded 32 byte public key. It isn't required
+    to be on the ed25519 curve: mints created by launchpads and programs can be
+    program derived addresses, which are off the curve on purpose.
+    """
+    try:
+        public_key = b58decode(address)
+    except ValueError:
+        return False
+    return len(public_key) == 32
+
+
+def _keccak_f(state):
+    for round_constant in KECCAK_ROUND_CONSTANTS:
+        # Theta
+        columns = [state[x] ^ state[x + 5] ^ state[x + 10] ^ state[x + 15] ^ state[x + 20] for x in range(5)]
+        for x in range(5):
+            right = columns[(x + 1) % 5]
+            d = columns[(x - 1) % 5] ^ ((right << 1 | right >> 63) & MASK_64)
+            for y in range(0, 25, 5):
+                state[x + y] ^= d
+        # Rho and pi
+        moved = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                lane, rotation = state[x + 5 * y], KECCAK_ROTATIONS[x + 5 * y]
+                moved[y + 5 * ((2 * x + 3 * y) % 5)] = (lane << rotation | lane >> (64 - rotation)) & MASK_64
+        # Chi and iota
+        for y in range(0, 25, 5):
+            row = moved[y:y + 5]
+            for x in range(5):
+                state[x + y] = row[x] ^ (~row[(x + 1) % 5] & row[(x + 2) % 5])
+        state[0] ^= round_constant
+
+
+def keccak256(data):
+    """Keccak-256 as used by Ethereum (the original padding, not SHA3-256)."""
+    rate = 136
+    padded = bytearray(data) + b"\x01" + b"\0" * (-(len(data) + 1) % rate)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for start in range(0, len(padded), rate):
+        for index in range(rate // 8):
+            state[index] ^= int.from_bytes(padded[start + index * 8:start + index * 8 + 8], "little")
+        _keccak_f(state)
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
+
+
+def is_valid_ethereum_address(address):
+    """
+    Checks an 0x address against its EIP-55 checksum. All-lowercase and
+    all-uppercase addresses carry no checksum and are accepted as they are.
+    """
+    hex_part = address[2:]
+    if len(hex_part) != 40 or address[:2] not in ("0x", "0X"):
+        return False
+    try:
+        int(hex_part, 16)
+    except ValueError:
+        return False
+    if hex_part == hex_part.lower() or hex_part == hex_part.upper():
+        return True
+    digest = keccak256(hex_part.lower().encode("ascii")).hex()
+    # Every letter is uppercase exactly where the matching nibble of the hash is 8 or more
+    return all(char.isupper() == (int(nibble, 16) >= 8) for char, nibble in zip(hex_part, digest) if char.isalpha())
+
+
+VALIDATORS = {
+    "solana": is_valid_solana_address,
+    "ethereum": is_valid_ethereum_address,
+}
+
+
+def validate_batch(items):
+    """Validates a list of (kind, address) pairs and returns a list of booleans. Runs in the worker processes."""
+    return [VALIDATORS[kind](address) for kind, address in items]
+
+
+class AddressValidator:
+    """
+    Checks contract addresses without blocking the event loop.
+
+    Lookups wait for the end of the current loop iteration so that every
+    address asked for in the meantime goes to the process pool in one
+    batch. Results are kept in an LRU of `cache_size` entries, and an address
+    that is already being checked is not submitted twice. If worker processes
+    can't be used, batches are checked in the event loop instead.
+    """
+
+    def __init__(self, max_workers=None, cache_size=10_000):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (kind, address) -> valid, least recently used first
+        self.pending = {}  # (kind, address) -> future of the batch checking it
+        self.batch = []  # (kind, address) pairs waiting for the next submission
+        self.rejected = 0
+        self._tasks = set()
+        self._executor = None
+        self._inline = False
+
+    async def validate(self, kind, address):
+        """Returns True if address is a valid `kind` ("solana" or "ethereum") address."""
+        key = (kind, address)
+        valid = self.cache.get(key)
+        if valid is not None:
+            self.cache.move_to_end(key)
+            return valid
+        future = self.pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.pending[key] = loop.create_future()
+            if not self.batch:
+                loop.call_soon(self._submit)
+            self.batch.append(key)
+        return await asyncio.shield(future)
+
+    def _submit(self):
+        batch, self.batch = self.batch, []
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await self._check(batch)
+        except Exception as e:
+            for key in batch:
+                future = self.pending.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, valid in zip(batch, results):
+            self.cache[key] = valid
+            if not valid:
+                self.rejected += 1
+            self.pending.pop(key).set_result(valid)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def _check(self, batch):
+        if not self._inline:
+            # Imported here so that multiprocessing is only loaded once there is an address to check
+            from concurrent.futures import ProcessPoolExecutor
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self.max_workers)
+                return await asyncio.get_running_loop().run_in_executor(self._executor, validate_batch, batch)
+            except (BrokenProcessPool, OSError, NotImplementedError) as e:
+                log.warning("Address validation can't use worker processes (%r), validating in the event loop.", e)
+                self._inline = True
+        return validate_batch(batch)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
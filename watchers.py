@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class WatcherRegistry:
+    """
+    Keeps track of the supervised tasks that watch source chats.
+
+    Every watcher runs in its own task, registered under a name such as
+    "job1/Keyword/-1001234567890". A watcher that raises is restarted with
+    exponential backoff, and `limit` bounds how many watchers may talk to
+    Telegram at the same time.
+    """
+
+    def __init__(self, max_concurrency=10, initial_backoff=1, max_backoff=300):
+        self.limit = asyncio.Semaphore(max_concurrency)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.tasks = {}  # watcher name -> asyncio.Task
+        self.restarts = {}  # watcher name -> number of restarts
+        self.failing = set()  # watcher names waiting to be restarted after an error
+        self.dead = set()  # watcher names that stopped without being cancelled
+
+    def start(self, name, watcher_factory):
+        """Starts a supervised watcher. watcher_factory is called again on every restart."""
+        if name in self.tasks:
+            raise ValueError(f"Watcher '{name}' is already running.")
+        self.restarts[name] = 0
+        self.dead.discard(name)
+        task = asyncio.create_task(self._supervise(name, watcher_factory), name=name)
+        self.tasks[name] = task
+        task.add_done_callback(lambda finished: self._forget(name, finished))
+        return task
+
+    def _forget(self, name, task):
+        if self.tasks.get(name) is task:
+            del self.tasks[name]
+            self.restarts.pop(name, None)
+            self.failing.discard(name)
+            if not task.cancelled():
+                self.dead.add(name)
+
+    async def _supervise(self, name, watcher_factory):
+        loop = asyncio.get_running_loop()
+        backoff = self.initial_backoff
+        while True:
+            started = loop.time()
+            try:
+                await watcher_factory()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A watcher that stayed up for a while gets a fresh backoff
+                if loop.time() - started > self.max_backoff:
+                    backoff = self.initial_backoff
+                self.restarts[name] += 1
+                self.failing.add(name)
+                log.warning("Watcher %s failed: %r. Restarting in %s seconds.", name, e, backoff,
+                            extra={"event": "watcher_failed", "watcher": name, "error": repr(e), "backoff": backoff,
+                                   "rate_key": ("watcher_failed", name)})
+                await asyncio.sleep(backoff)
+                self.failing.discard(name)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def names(self, prefix=None):
+        """Returns the watcher names, optionally only those of one job (or a single watcher)."""
+        if prefix is None:
+            return sorted(self.tasks)
+        return sorted(name for name in self.tasks if name == prefix or name.startswith(prefix + "/"))
+
+    def jobs(self):
+        """Groups the running watcher names by job name."""
+        jobs = {}
+        for name in sorted(self.tasks):
+            jobs.setdefault(name.split("/", 1)[0], []).append(name)
+        return jobs
+
+    async def stop(self, prefix=None):
+        """Cancels the matching watchers and waits for them to finish. Returns how many were stopped."""
+        tasks = [self.tasks[name] for name in self.names(prefix)]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)